@@ -18,8 +18,13 @@ if 'fclass' in gdf.columns:
     suitable_types = ['school', 'town_hall', 'community_centre', 'hospital', 
                      'sports_centre', 'stadium', 'university', 'college']
     
-    filtered = gdf[gdf['fclass'].isin(suitable_types)]
+    filtered = gdf.loc[gdf['fclass'].isin(suitable_types)].copy()
     print(f"\nSuitable evacuation centers: {len(filtered)}")
+    
+    # Build the R-tree once so spatial joins against the centers, e.g.
+    # gpd.sjoin_nearest(buildings, filtered), use it instead of pairwise tests
+    centers_sindex = filtered.sindex
+    print(f"Spatial index built over {centers_sindex.size} centers")
     print(f"Types found: {filtered['fclass'].value_counts()}")
     
     # Sample some centers
@@ -6,13 +6,210 @@ Handles large road networks and provides detailed route analysis
 
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
 import heapq
 import json
+import copy
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Dict, Optional
 import matplotlib.pyplot as plt
 import networkx as nx
+from scipy.spatial import cKDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from pathlib import Path
 import random
+import os
+
+try:
+    import igraph as ig
+except ImportError:  # Fall back to the NetworkX-based Dijkstra
+    ig = None
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+except ImportError:  # Fall back to parsing the CSVs on every load
+    pyarrow = None
+
+try:
+    from numba import njit
+except ImportError:  # Fall back to the pure-Python heap Dijkstra
+    njit = None
+
+
+def _dijkstra_csr(indptr, adj, w, src, dst, n):
+    """
+    Dijkstra over CSR arrays with an array-backed binary heap.
+    Stops once dst is settled; returns (dist, prev) arrays indexed by node id.
+    """
+    dist = np.full(n, np.inf)
+    prev = np.full(n, -1, dtype=np.int64)
+    
+    # Each directed edge is relaxed at most once, so this bounds the heap size
+    capacity = adj.shape[0] + 1
+    heap_keys = np.empty(capacity, dtype=np.float64)
+    heap_nodes = np.empty(capacity, dtype=np.int64)
+    
+    dist[src] = 0.0
+    heap_keys[0] = 0.0
+    heap_nodes[0] = src
+    size = 1
+    
+    while size > 0:
+        d = heap_keys[0]
+        u = heap_nodes[0]
+        size -= 1
+        
+        # Move the last entry to the root and sift it down
+        if size > 0:
+            key = heap_keys[size]
+            node = heap_nodes[size]
+            i = 0
+            while True:
+                c = 2 * i + 1
+                if c >= size:
+                    break
+                if c + 1 < size and heap_keys[c + 1] < heap_keys[c]:
+                    c += 1
+                if heap_keys[c] >= key:
+                    break
+                heap_keys[i] = heap_keys[c]
+                heap_nodes[i] = heap_nodes[c]
+                i = c
+            heap_keys[i] = key
+            heap_nodes[i] = node
+        
+        # Skip stale queue entries
+        if d > dist[u]:
+            continue
+        if u == dst:
+            break
+        
+        for k in range(indptr[u], indptr[u + 1]):
+            v = adj[k]
+            nd = d + w[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                prev[v] = u
+                
+                # Push (nd, v) and sift it up
+                i = size
+                size += 1
+                while i > 0:
+                    parent = (i - 1) >> 1
+                    if heap_keys[parent] <= nd:
+                        break
+                    heap_keys[i] = heap_keys[parent]
+                    heap_nodes[i] = heap_nodes[parent]
+                    i = parent
+                heap_keys[i] = nd
+                heap_nodes[i] = v
+    
+    return dist, prev
+
+
+def _union_find(src, dst, n):
+    """
+    Union-Find with path halving and union by rank over an undirected edge list.
+    Returns the root node id of every node's component.
+    """
+    parent = np.arange(n)
+    rank = np.zeros(n, dtype=np.int32)
+    
+    for i in range(src.shape[0]):
+        a = src[i]
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        b = dst[i]
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a == b:
+            continue
+        
+        # Attach the shallower tree under the deeper one
+        if rank[a] < rank[b]:
+            a, b = b, a
+        parent[b] = a
+        if rank[a] == rank[b]:
+            rank[a] += 1
+    
+    # Flatten so every node points straight at its root
+    for v in range(n):
+        root = v
+        while parent[root] != root:
+            root = parent[root]
+        parent[v] = root
+    
+    return parent
+
+
+if njit is not None:
+    # nogil lets concurrent strategy searches run the kernel in parallel threads
+    _dijkstra_csr = njit(cache=True, nogil=True)(_dijkstra_csr)
+    _union_find = njit(cache=True)(_union_find)
+
+
+def _read_csv_cached(csv_path, usecols, dtype):
+    """
+    pd.read_csv(csv_path, usecols=usecols, dtype=dtype) through a Parquet copy.
+    The copy is written next to the CSV on first read and reused while it is
+    newer than the CSV and has the columns asked for. Needs pyarrow; set
+    SHELTR_PARQUET_CACHE=0 to always parse the CSV.
+    """
+    csv_path = Path(csv_path)
+    if pyarrow is None or os.getenv("SHELTR_PARQUET_CACHE", "1") == "0":
+        return pd.read_csv(csv_path, usecols=usecols, dtype=dtype)
+    
+    parquet_path = csv_path.with_suffix('.parquet')
+    try:
+        if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            return pd.read_parquet(parquet_path, columns=usecols, memory_map=True).astype(dtype)
+    except Exception as e:  # Stale schema or unreadable file: rebuild it
+        print(f"Ignoring Parquet cache {parquet_path}: {e}")
+    
+    df = pd.read_csv(csv_path, usecols=usecols, dtype=dtype)
+    try:
+        df.to_parquet(parquet_path, compression='zstd', index=False)
+    except Exception as e:
+        print(f"Could not write Parquet cache {parquet_path}: {e}")
+    return df
+
+
+def _load_node_table(graph_file, num_edges: int) -> Optional[Dict]:
+    """
+    Node table cached by _save_node_table, or None if it is missing, older than
+    the graph CSV, built for a different edge count, or SHELTR_GRAPH_CACHE=0.
+    """
+    graph_path = Path(graph_file)
+    cache_path = graph_path.with_suffix('.nodes.npz')
+    if os.getenv("SHELTR_GRAPH_CACHE", "1") == "0" or not cache_path.exists():
+        return None
+    try:
+        if cache_path.stat().st_mtime < graph_path.stat().st_mtime:
+            return None
+        with np.load(cache_path) as npz:
+            table = {key: npz[key] for key in npz.files}
+        if len(table['from_id']) != num_edges:
+            return None
+        return table
+    except Exception as e:
+        print(f"Ignoring node cache {cache_path}: {e}")
+        return None
+
+
+def _save_node_table(graph_file, table: Dict):
+    """Save the interned node table next to the graph CSV for the next start"""
+    if os.getenv("SHELTR_GRAPH_CACHE", "1") == "0":
+        return
+    cache_path = Path(graph_file).with_suffix('.nodes.npz')
+    try:
+        # np.savez appends .npz to names without it, so hand it an open file
+        with open(cache_path, 'wb') as f:
+            np.savez(f, **table)
+    except OSError as e:
+        print(f"Could not write node cache {cache_path}: {e}")
 
 class ComprehensiveFloodRiskRouter:
     def __init__(self, segments_file="segments_safe_min.csv", graph_file="segments_graph.csv"):
@@ -27,9 +224,28 @@ class ComprehensiveFloodRiskRouter:
         self.graph_data = None
         self.graph = None
         self.safety_weights = None
-        self.connected_components = None
-        self.largest_component = None
+        self.connected_components = None  # Component label per node id
+        self.largest_component = None  # Node ids of the largest component
+        self._component_sizes = None  # Node count per component label
         self.segment_id_map = {}  # Map graph indices to actual segment IDs
+        self._ig = None  # igraph mirror of self.graph for C-level Dijkstra
+        self._name_to_id = {}  # "x,y" node name -> integer node id
+        self._id_to_name = []  # Integer node id -> "x,y" node name
+        self._node_xy = None  # (N, 2) node coordinates, row i belongs to node id i
+        self._graph_node_ids = None  # Ids of the nodes in the active graph
+        # CSR adjacency: neighbours of node u are _adj[_indptr[u]:_indptr[u + 1]]
+        self._indptr = None
+        self._adj = None
+        self._w = None
+        self._ig_weights = None  # Active weights aligned with the igraph edge list
+        self._row_weights = None  # Active weights indexed by graph_data row
+        self._weights = {}  # Cost function -> per-row edge weights
+        self._row_distance = None  # Per-row segment distance
+        self._row_safety = None  # Per-row segment safety probability
+        self._edge_lookup = {}  # (from id, to id) -> graph_data row of the active graph's edge
+        self._kdtree = None  # Spatial index over the active graph's node coordinates
+        self._structure_cache = {}  # min_component_size -> weight-independent graph structure
+        self._graph_cache = {}  # (cost_function, min_component_size) -> graph state
         
     def load_data(self):
         """Load safety predictions and graph structure data"""
@@ -37,14 +253,47 @@ class ComprehensiveFloodRiskRouter:
         print("LOADING ROUTING DATA")
         print("=" * 60)
         
-        # Load safety predictions
-        self.safety_data = pd.read_csv(self.segments_file)
+        # Load safety predictions (only the columns routing needs, with narrow dtypes)
+        self.safety_data = _read_csv_cached(
+            self.segments_file,
+            usecols=['HubName', 'pred_prob_safe'],
+            dtype={'HubName': 'int64', 'pred_prob_safe': 'float32'}
+        )
         print(f"Loaded safety data: {len(self.safety_data)} segments")
         
-        # Load graph structure
-        self.graph_data = pd.read_csv(self.graph_file)
+        # Load graph structure; node strings repeat across edges, so read them as categories
+        self.graph_data = _read_csv_cached(
+            self.graph_file,
+            usecols=['road_segment_id', 'from', 'to', 'cost'],
+            dtype={'road_segment_id': 'int64', 'from': 'category', 'to': 'category', 'cost': 'float32'}
+        )
         print(f"Loaded graph data: {len(self.graph_data)} edges")
         
+        # Intern "x,y" node strings to integer ids and parse their coordinates once;
+        # the result is cached next to the graph CSV so later starts skip both steps
+        num_edges = len(self.graph_data)
+        node_table = _load_node_table(self.graph_file, num_edges)
+        if node_table is None:
+            nodes = union_categoricals([self.graph_data['from'], self.graph_data['to']])
+            node_ids = nodes.codes
+            node_names = nodes.categories
+            node_table = {
+                'from_id': node_ids[:num_edges],
+                'to_id': node_ids[num_edges:],
+                'node_names': np.asarray(node_names, dtype=str),
+                'node_xy': (
+                    pd.Series(node_names).str.split(',', expand=True)
+                    .to_numpy(dtype=np.float64).reshape(len(node_names), 2)
+                )
+            }
+            _save_node_table(self.graph_file, node_table)
+        self.graph_data['from_id'] = node_table['from_id']
+        self.graph_data['to_id'] = node_table['to_id']
+        self._id_to_name = node_table['node_names'].tolist()
+        self._name_to_id = {name: i for i, name in enumerate(self._id_to_name)}
+        self._node_xy = node_table['node_xy']
+        print(f"Indexed {len(self._id_to_name)} nodes")
+        
         # Create mapping from graph indices to actual segment IDs
         # If using segments_graph_full.csv, road_segment_id is just the row index
         # We need to map it to the actual HubName from safety_data
@@ -55,14 +304,34 @@ class ComprehensiveFloodRiskRouter:
                 self.segment_id_map[str(idx)] = str(int(row['HubName']))
             print(f"Created segment ID mapping for {len(self.segment_id_map)} segments")
         
-        # Create safety weights mapping
-        self.safety_weights = dict(zip(
-            self.safety_data['HubName'].astype(str), 
-            self.safety_data['pred_prob_safe']
-        ))
+        # Create safety weights mapping (Series so edge lookups can use a hashed .map)
+        self.safety_weights = pd.Series(
+            self.safety_data['pred_prob_safe'].to_numpy(),
+            index=self.safety_data['HubName'].astype(str)
+        )
+        self.safety_weights = self.safety_weights[~self.safety_weights.index.duplicated(keep='last')]
         
         print(f"Created safety weights for {len(self.safety_weights)} segments")
         
+        # Precompute every cost function's edge weights in one vectorized pass.
+        # Weights are stored as float32 (max ~1e4, well within range) to halve the
+        # bytes the searches stream; path distances are still accumulated in float64.
+        self.graph_data['segment_id'] = self.graph_data['road_segment_id'].astype(str)
+        self.graph_data['safety_prob'] = self.graph_data['segment_id'].map(self.safety_weights).fillna(0.5)
+        self._row_distance = self.graph_data['cost'].to_numpy(dtype=np.float64)
+        self._row_safety = self.graph_data['safety_prob'].to_numpy(dtype=np.float64)
+        distance = self.graph_data['cost'].to_numpy(dtype=np.float32)
+        flood_risk = np.float32(1.0) - self.graph_data['safety_prob'].to_numpy(dtype=np.float32)
+        self._weights = {
+            'distance': distance,
+            # Invert safety probability (higher safety = lower cost)
+            'safety': flood_risk * np.float32(1000),
+            # Combine distance and safety
+            'combined': distance + flood_risk * np.float32(1000),
+            # Use flood risk as primary cost
+            'flood_risk': flood_risk * np.float32(10000) + distance * np.float32(0.1)
+        }
+        
         return self.safety_data, self.graph_data
     
     def analyze_network_structure(self):
@@ -71,36 +340,46 @@ class ComprehensiveFloodRiskRouter:
         print("ANALYZING NETWORK STRUCTURE")
         print("=" * 60)
         
-        # Create basic graph for analysis
-        G = nx.Graph()
-        
-        for _, row in self.graph_data.iterrows():
-            from_node = row['from']
-            to_node = row['to']
-            G.add_edge(from_node, to_node)
+        # Label components straight from the integer edge list; no graph object is needed
+        num_nodes = len(self._id_to_name)
+        from_ids = self.graph_data['from_id'].to_numpy(dtype=np.int64)
+        to_ids = self.graph_data['to_id'].to_numpy(dtype=np.int64)
         
-        # Find connected components
-        self.connected_components = list(nx.connected_components(G))
+        if njit is not None:
+            roots = _union_find(from_ids, to_ids, num_nodes)
+            # Relabel roots to consecutive component ids
+            _, self.connected_components = np.unique(roots, return_inverse=True)
+        else:
+            # Without numba the union-find loop runs in Python; let scipy do the traversal in C
+            adjacency = coo_matrix(
+                (np.ones(len(from_ids), dtype=np.int8), (from_ids, to_ids)),
+                shape=(num_nodes, num_nodes)
+            )
+            _, self.connected_components = connected_components(adjacency, directed=False)
+        self._component_sizes = np.bincount(self.connected_components)
+        # Graphs built from the previous components are no longer valid
+        self._structure_cache = {}
+        self._graph_cache = {}
         
-        print(f"Number of connected components: {len(self.connected_components)}")
+        print(f"Number of connected components: {len(self._component_sizes)}")
         
         # Analyze component sizes
-        component_sizes = [len(comp) for comp in self.connected_components]
-        component_sizes.sort(reverse=True)
+        component_sizes = np.sort(self._component_sizes)[::-1]
         
         print(f"Component size distribution:")
-        print(f"  Largest: {component_sizes[0] if component_sizes else 0}")
-        print(f"  Top 5: {component_sizes[:5]}")
-        print(f"  Components with 1 node: {sum(1 for size in component_sizes if size == 1)}")
-        print(f"  Components with 2+ nodes: {sum(1 for size in component_sizes if size >= 2)}")
+        print(f"  Largest: {component_sizes[0] if len(component_sizes) else 0}")
+        print(f"  Top 5: {component_sizes[:5].tolist()}")
+        print(f"  Components with 1 node: {int((component_sizes == 1).sum())}")
+        print(f"  Components with 2+ nodes: {int((component_sizes >= 2).sum())}")
         
         # Find largest component
-        if self.connected_components:
-            self.largest_component = max(self.connected_components, key=len)
+        if len(self._component_sizes):
+            largest_id = self._component_sizes.argmax()
+            self.largest_component = np.flatnonzero(self.connected_components == largest_id)
             print(f"Largest component: {len(self.largest_component)} nodes")
             
             # Sample nodes from largest component
-            sample_nodes = list(self.largest_component)[:10]
+            sample_nodes = [self._id_to_name[node] for node in self.largest_component[:10]]
             print(f"Sample nodes: {sample_nodes[:3]}...")
         
         return self.connected_components
@@ -108,89 +387,146 @@ class ComprehensiveFloodRiskRouter:
     def create_enhanced_graph(self, cost_function='combined', min_component_size=2):
         """
         Create an enhanced graph with better connectivity
+        
+        The topology is built once per component size; switching the cost
+        function only swaps in that function's precomputed edge weights.
         """
+        cache_key = (cost_function, min_component_size)
+        if cache_key in self._graph_cache:
+            print(f"\nUsing cached graph for cost function: {cost_function}")
+            self._restore_graph_state(self._graph_cache[cache_key])
+            return self.graph
+        
         print(f"\nCreating enhanced graph with cost function: {cost_function}")
         
-        # Initialize NetworkX graph
-        self.graph = nx.Graph()
+        structure = self._structure_cache.get(min_component_size)
+        if structure is None:
+            structure = self._build_graph_structure(min_component_size)
+            if structure is None:
+                self.graph = nx.Graph()
+                self._ig = None
+                return self.graph
+            self._structure_cache[min_component_size] = structure
         
-        # Filter components by minimum size
-        valid_components = [comp for comp in self.connected_components if len(comp) >= min_component_size]
+        # Swap in this cost function's weights (unknown functions fall back to distance)
+        row_weights = self._weights.get(cost_function, self._weights['distance'])
+        edge_weights = row_weights[structure['edge_rows']]
+        state = dict(structure)
+        state['row_weights'] = row_weights
+        state['ig_weights'] = edge_weights
+        state['w'] = np.concatenate([edge_weights, edge_weights])[structure['csr_order']]
         
-        if not valid_components:
+        self._graph_cache[cache_key] = state
+        self._restore_graph_state(state)
+        
+        return self.graph
+    
+    def _build_graph_structure(self, min_component_size: int) -> Optional[Dict]:
+        """Build the weight-independent graph, CSR layout, KD-tree and igraph mirror"""
+        # Filter components by minimum size
+        sizes = self._component_sizes
+        if sizes is None or not len(sizes) or sizes.max() < min_component_size:
             print("No components meet minimum size requirement")
-            return self.graph
+            return None
         
         # Use largest valid component
-        largest_valid = max(valid_components, key=len)
-        print(f"Using component with {len(largest_valid)} nodes")
-        
-        # Add edges with weights
-        edges_added = 0
-        for _, row in self.graph_data.iterrows():
-            segment_id = str(row['road_segment_id'])
-            from_node = row['from']
-            to_node = row['to']
-            distance = row['cost']
-            
-            # Skip if edge not in selected component
-            if from_node not in largest_valid or to_node not in largest_valid:
-                continue
-            
-            # Calculate edge weight based on cost function
-            if cost_function == 'distance':
-                weight = distance
-            elif cost_function == 'safety':
-                # Invert safety probability (higher safety = lower cost)
-                safety_prob = self.safety_weights.get(segment_id, 0.5)
-                weight = (1.0 - safety_prob) * 1000
-            elif cost_function == 'combined':
-                # Combine distance and safety
-                safety_prob = self.safety_weights.get(segment_id, 0.5)
-                safety_cost = (1.0 - safety_prob) * 1000
-                weight = distance + safety_cost
-            elif cost_function == 'flood_risk':
-                # Use flood risk as primary cost
-                safety_prob = self.safety_weights.get(segment_id, 0.5)
-                flood_risk = 1.0 - safety_prob
-                weight = flood_risk * 10000 + distance * 0.1
-            else:
-                weight = distance
-            
-            # Add edge to graph
-            self.graph.add_edge(from_node, to_node, 
-                              weight=weight, 
-                              segment_id=segment_id,
-                              distance=distance,
-                              safety_prob=self.safety_weights.get(segment_id, 0.5))
-            edges_added += 1
+        largest_id = sizes.argmax()
+        print(f"Using component with {sizes[largest_id]} nodes")
+        
+        # Keep only edges inside the selected component
+        in_largest = self.connected_components == largest_id
+        df = self.graph_data
+        df = df[in_largest[df['from_id'].to_numpy()] & in_largest[df['to_id'].to_numpy()]]
         
-        print(f"Created graph with {self.graph.number_of_nodes()} nodes and {edges_added} edges")
+        edges = pd.DataFrame({
+            'from': df['from_id'],
+            'to': df['to_id'],
+            'row': df.index.to_numpy(),
+            'segment_id': df['segment_id'],
+            'distance': df['cost'],
+            'safety_prob': df['safety_prob']
+        })
+        edges_added = len(edges)
+        
+        # Add all edges in one call; 'row' points back into graph_data and the weight arrays
+        graph = nx.from_pandas_edgelist(
+            edges, 'from', 'to',
+            edge_attr=['row', 'segment_id', 'distance', 'safety_prob']
+        )
+        
+        print(f"Created graph with {graph.number_of_nodes()} nodes and {edges_added} edges")
         
         # Calculate graph metrics
-        if self.graph.number_of_nodes() > 0:
-            density = nx.density(self.graph)
+        if graph.number_of_nodes() > 0:
+            density = nx.density(graph)
             print(f"Graph density: {density:.4f}")
             
             # Check if graph is connected
-            is_connected = nx.is_connected(self.graph)
+            is_connected = nx.is_connected(graph)
             print(f"Graph is connected: {is_connected}")
         
-        return self.graph
+        # Index the graph's nodes for nearest-node queries
+        num_nodes = len(self._id_to_name)
+        graph_node_ids = np.fromiter(graph.nodes(), dtype=np.int64, count=graph.number_of_nodes())
+        
+        edge_list = list(graph.edges(data='row'))
+        u = np.fromiter((e[0] for e in edge_list), dtype=np.int32, count=len(edge_list))
+        v = np.fromiter((e[1] for e in edge_list), dtype=np.int32, count=len(edge_list))
+        edge_rows = np.fromiter((e[2] for e in edge_list), dtype=np.int64, count=len(edge_list))
+        
+        # CSR adjacency. Undirected graph: store both directions, grouped by source node
+        src = np.concatenate([u, v])
+        dst = np.concatenate([v, u])
+        csr_order = np.argsort(src, kind='stable')
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=indptr[1:])
+        
+        return {
+            'graph': graph,
+            'graph_node_ids': graph_node_ids,
+            'edge_lookup': dict(zip(
+                zip(src.tolist(), dst.tolist()),
+                np.concatenate([edge_rows, edge_rows]).tolist()
+            )),
+            'kdtree': cKDTree(self._node_xy[graph_node_ids]),
+            'edge_rows': edge_rows,
+            'csr_order': csr_order,
+            'indptr': indptr,
+            'adj': dst[csr_order],
+            # Mirror the graph into igraph so shortest paths run in C
+            'ig': ig.Graph(n=num_nodes, edges=list(zip(u.tolist(), v.tolist()))) if ig is not None else None
+        }
+    
+    def _restore_graph_state(self, state: Dict):
+        """Make a cached graph snapshot the active graph"""
+        self.graph = state['graph']
+        self._graph_node_ids = state['graph_node_ids']
+        self._edge_lookup = state['edge_lookup']
+        self._indptr = state['indptr']
+        self._adj = state['adj']
+        self._w = state['w']
+        self._kdtree = state['kdtree']
+        self._ig = state['ig']
+        self._ig_weights = state['ig_weights']
+        self._row_weights = state['row_weights']
     
     def find_closest_nodes(self, target_coords: str, num_candidates: int = 10) -> List[Tuple[str, float]]:
         """Find the closest nodes to given coordinates"""
         target_x, target_y = map(float, target_coords.split(','))
         
-        distances = []
-        for node in self.graph.nodes():
-            node_x, node_y = map(float, node.split(','))
-            dist = np.sqrt((target_x - node_x)**2 + (target_y - node_y)**2)
-            distances.append((node, dist))
+        num_candidates = min(num_candidates, len(self._graph_node_ids))
+        if num_candidates < 1:
+            return []
         
-        # Sort by distance and return closest nodes
-        distances.sort(key=lambda x: x[1])
-        return distances[:num_candidates]
+        # k-nearest query on the KD-tree; results come back sorted by distance
+        distances, candidates = self._kdtree.query([target_x, target_y], k=num_candidates)
+        distances = np.atleast_1d(distances)
+        candidates = np.atleast_1d(candidates)
+        
+        return [
+            (self._id_to_name[self._graph_node_ids[i]], float(d))
+            for i, d in zip(candidates, distances)
+        ]
     
     def dijkstra_shortest_path(self, start: str, end: str) -> Tuple[List[str], float, Dict]:
         """
@@ -202,111 +538,197 @@ class ComprehensiveFloodRiskRouter:
             raise ValueError("Graph not created. Call create_enhanced_graph() first.")
         
         # Check if nodes exist in graph
-        if start not in self.graph:
+        source = self._name_to_id.get(start)
+        if source is None or source not in self.graph:
             print(f"Start node {start} not found in graph")
             closest_start = self.find_closest_nodes(start, 1)[0]
             print(f"Using closest start node: {closest_start[0]} (distance: {closest_start[1]:.1f}m)")
-            start = closest_start[0]
+            source = self._name_to_id[closest_start[0]]
         
-        if end not in self.graph:
+        target = self._name_to_id.get(end)
+        if target is None or target not in self.graph:
             print(f"End node {end} not found in graph")
             closest_end = self.find_closest_nodes(end, 1)[0]
             print(f"Using closest end node: {closest_end[0]} (distance: {closest_end[1]:.1f}m)")
-            end = closest_end[0]
+            target = self._name_to_id[closest_end[0]]
+        
+        path_ids, total_cost = self._shortest_path_ids(source, target)
+        
+        if not path_ids:
+            return [], float('inf'), {}
+        
+        path = [self._id_to_name[node] for node in path_ids]
+        
+        # Get path details
+        path_details = self._get_path_details(path_ids)
+        
+        print(f"Found path with {len(path)} nodes, total cost: {total_cost:.2f}")
+        
+        return path, total_cost, path_details
+    
+    def _shortest_path_ids(self, source: int, target: int) -> Tuple[List[int], float]:
+        """Dispatch to the fastest available Dijkstra backend"""
+        if self._ig is not None:
+            return self._igraph_shortest_path(source, target)
+        elif njit is not None:
+            return self._jit_shortest_path(source, target)
+        return self._heap_shortest_path(source, target)
+    
+    def _igraph_shortest_path(self, source: int, target: int) -> Tuple[List[int], float]:
+        """Run Dijkstra on the igraph mirror"""
+        path = self._ig.get_shortest_paths(
+            source, to=target, weights=self._ig_weights, output='vpath'
+        )[0]
+        
+        if not path:
+            return [], float('inf')
+        
+        total_cost = 0
+        for u, v in zip(path, path[1:]):
+            total_cost += float(self._row_weights[self._edge_lookup[(u, v)]])
+        
+        return path, total_cost
+    
+    def _jit_shortest_path(self, source: int, target: int) -> Tuple[List[int], float]:
+        """Run the Numba-compiled CSR Dijkstra"""
+        dist, prev = _dijkstra_csr(
+            self._indptr, self._adj, self._w,
+            source, target, len(self._id_to_name)
+        )
+        
+        if not np.isfinite(dist[target]):
+            return [], float('inf')
+        
+        path = []
+        current = target
+        while current != -1:
+            path.append(int(current))
+            current = prev[current]
+        path.reverse()
+        
+        return path, float(dist[target])
+    
+    def _heap_shortest_path(self, source: int, target: int) -> Tuple[List[int], float]:
+        """Pure-Python bidirectional heap Dijkstra over the CSR adjacency arrays"""
+        if source == target:
+            return [source], 0.0
+        
+        indptr = self._indptr
+        adj = self._adj
+        weights = self._w
         
-        # Initialize distances and previous nodes
-        distances = {node: float('inf') for node in self.graph.nodes()}
-        previous = {node: None for node in self.graph.nodes()}
-        distances[start] = 0
+        # Forward search from the source, backward search from the target. The graph is
+        # undirected, so both sides walk the same adjacency. Distances and previous
+        # nodes are filled in lazily on first relaxation.
+        inf = float('inf')
+        distances = ({source: 0.0}, {target: 0.0})
+        previous = ({}, {})
         
-        # Priority queue: (distance, node)
-        pq = [(0, start)]
-        visited = set()
+        # Priority queues: (distance, node id). heapq is a C binary heap, which beats a
+        # Python-level d-ary heap here, so only bind its operations locally.
+        queues = ([(0.0, source)], [(0.0, target)])
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        best_cost = inf
+        meeting_node = None
         nodes_explored = 0
         
-        while pq:
-            current_dist, current_node = heapq.heappop(pq)
+        while queues[0] and queues[1]:
+            # No unsettled node can improve on the best path found so far
+            if queues[0][0][0] + queues[1][0][0] >= best_cost:
+                break
+            
+            # Expand the side with the smaller frontier distance
+            side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            dist = distances[side]
+            other_dist = distances[1 - side]
+            prev = previous[side]
+            pq = queues[side]
+            
+            current_dist, current_node = heappop(pq)
             
-            if current_node in visited:
+            # Skip stale queue entries
+            if current_dist > dist[current_node]:
                 continue
-                
-            visited.add(current_node)
-            nodes_explored += 1
             
-            if current_node == end:
-                break
+            nodes_explored += 1
             
             # Explore neighbors
-            for neighbor in self.graph.neighbors(current_node):
-                if neighbor in visited:
-                    continue
+            for k in range(indptr[current_node], indptr[current_node + 1]):
+                neighbor = adj[k]
+                new_dist = current_dist + float(weights[k])
                 
-                edge_data = self.graph[current_node][neighbor]
-                edge_weight = edge_data['weight']
-                new_dist = current_dist + edge_weight
+                if new_dist < dist.get(neighbor, inf):
+                    dist[neighbor] = new_dist
+                    prev[neighbor] = current_node
+                    heappush(pq, (new_dist, neighbor))
                 
-                if new_dist < distances[neighbor]:
-                    distances[neighbor] = new_dist
-                    previous[neighbor] = current_node
-                    heapq.heappush(pq, (new_dist, neighbor))
+                # Check whether this edge joins the two searches more cheaply
+                if neighbor in other_dist:
+                    total = new_dist + other_dist[neighbor]
+                    if total < best_cost:
+                        best_cost = total
+                        meeting_node = neighbor
         
         print(f"Explored {nodes_explored} nodes")
         
         # Reconstruct path
-        if distances[end] == float('inf'):
-            return [], float('inf'), {}
+        if meeting_node is None:
+            return [], inf
         
         path = []
-        current = end
+        current = meeting_node
         while current is not None:
-            path.append(current)
-            current = previous[current]
+            path.append(int(current))
+            current = previous[0].get(current)
         path.reverse()
         
-        # Get path details
-        path_details = self._get_path_details(path)
-        
-        print(f"Found path with {len(path)} nodes, total cost: {distances[end]:.2f}")
+        current = previous[1].get(meeting_node)
+        while current is not None:
+            path.append(int(current))
+            current = previous[1].get(current)
         
-        return path, distances[end], path_details
+        return path, float(best_cost)
     
-    def _get_path_details(self, path: List[str]) -> Dict:
-        """Get detailed information about the path"""
+    def _get_path_details(self, path: List[int]) -> Dict:
+        """Get detailed information about the path (given as node ids)"""
         if len(path) < 2:
             return {'segments': [], 'total_distance': 0, 'avg_safety': 0}
         
-        segments = []
-        total_distance = 0
-        safety_probs = []
+        # Resolve each step to its graph_data row, then gather distances/safeties at once
+        steps = [
+            (current, next_node, self._edge_lookup[(current, next_node)])
+            for current, next_node in zip(path, path[1:])
+            if (current, next_node) in self._edge_lookup
+        ]
+        rows = np.fromiter((step[2] for step in steps), dtype=np.int64, count=len(steps))
+        distances = self._row_distance[rows]
+        safety_probs = self._row_safety[rows]
+        segment_ids = self.graph_data['segment_id'].to_numpy()[rows]
         
-        for i in range(len(path) - 1):
-            current = path[i]
-            next_node = path[i + 1]
+        segments = []
+        for (current, next_node, _), segment_id, distance, safety_prob in zip(
+            steps, segment_ids, distances.tolist(), safety_probs.tolist()
+        ):
+            # Map segment_id to actual HubName if using full graph
+            segment_id = self.segment_id_map.get(segment_id, segment_id)
             
-            if self.graph.has_edge(current, next_node):
-                edge_data = self.graph[current][next_node]
-                # Map segment_id to actual HubName if using full graph
-                segment_id = edge_data['segment_id']
-                if segment_id in self.segment_id_map:
-                    segment_id = self.segment_id_map[segment_id]
-                
-                segments.append({
-                    'segment_id': segment_id,
-                    'from': current,
-                    'to': next_node,
-                    'distance': edge_data['distance'],
-                    'safety_prob': edge_data['safety_prob']
-                })
-                total_distance += edge_data['distance']
-                safety_probs.append(edge_data['safety_prob'])
+            segments.append({
+                'segment_id': segment_id,
+                'from': self._id_to_name[current],
+                'to': self._id_to_name[next_node],
+                'distance': distance,
+                'safety_prob': safety_prob
+            })
         
+        has_steps = len(steps) > 0
         return {
             'segments': segments,
-            'total_distance': total_distance,
-            'avg_safety': np.mean(safety_probs) if safety_probs else 0,
-            'min_safety': min(safety_probs) if safety_probs else 0,
-            'max_safety': max(safety_probs) if safety_probs else 0,
-            'safety_std': np.std(safety_probs) if safety_probs else 0
+            'total_distance': float(distances.sum()),
+            'avg_safety': float(safety_probs.mean()) if has_steps else 0,
+            'min_safety': float(safety_probs.min()) if has_steps else 0,
+            'max_safety': float(safety_probs.max()) if has_steps else 0,
+            'safety_std': float(safety_probs.std()) if has_steps else 0
         }
     
     def find_optimal_route(self, start: str, end: str, cost_function='combined') -> Dict:
@@ -323,6 +745,22 @@ class ComprehensiveFloodRiskRouter:
         # Find shortest path
         path, total_cost, path_details = self.dijkstra_shortest_path(start, end)
         
+        return self._route_stats(path, total_cost, path_details, cost_function)
+    
+    def _route_by_ids(self, source: int, target: int, cost_function: str) -> Dict:
+        """
+        Route between two node ids on the active graph.
+        Skips the graph setup and name resolution done by find_optimal_route.
+        """
+        path_ids, total_cost = self._shortest_path_ids(source, target)
+        if not path_ids:
+            return self._route_stats([], total_cost, {}, cost_function)
+        
+        path = [self._id_to_name[node] for node in path_ids]
+        return self._route_stats(path, total_cost, self._get_path_details(path_ids), cost_function)
+    
+    def _route_stats(self, path: List[str], total_cost: float, path_details: Dict, cost_function: str) -> Dict:
+        """Summarize a found path (or the lack of one) as a route result"""
         if not path:
             return {
                 'success': False,
@@ -358,10 +796,18 @@ class ComprehensiveFloodRiskRouter:
         strategies = ['distance', 'safety', 'combined', 'flood_risk']
         results = {}
         
+        def run_strategy(strategy):
+            # Each worker routes on a shallow copy so swapping the active graph
+            # in one thread does not affect the others; graph caches stay shared
+            return copy.copy(self).find_optimal_route(start, end, strategy)
+        
+        with ThreadPoolExecutor(max_workers=len(strategies)) as executor:
+            futures = {strategy: executor.submit(run_strategy, strategy) for strategy in strategies}
+        
         for strategy in strategies:
             print(f"\nTesting {strategy} strategy...")
             try:
-                route = self.find_optimal_route(start, end, strategy)
+                route = futures[strategy].result()
                 if route['success']:
                     results[strategy] = route
                     print(f"  Distance: {route['total_distance']:.2f}m")
@@ -381,26 +827,27 @@ class ComprehensiveFloodRiskRouter:
         print(f"GENERATING {num_routes} SAMPLE ROUTES")
         print("=" * 60)
         
-        if not self.largest_component or len(self.largest_component) < 2:
+        if self.largest_component is None or len(self.largest_component) < 2:
             print("Not enough nodes for sample routes")
             return []
         
-        # Create graph for sampling
+        # Create graph once; every sample route runs on it directly
         self.create_enhanced_graph('combined')
         
         sample_routes = []
-        nodes = list(self.graph.nodes())
+        node_ids = self._graph_node_ids
         
         for i in range(num_routes):
             # Randomly select start and end points
-            start, end = random.sample(nodes, 2)
+            start_idx, end_idx = random.sample(range(len(node_ids)), 2)
+            source, target = int(node_ids[start_idx]), int(node_ids[end_idx])
             
             print(f"\nSample Route {i+1}:")
-            print(f"  Start: {start}")
-            print(f"  End: {end}")
+            print(f"  Start: {self._id_to_name[source]}")
+            print(f"  End: {self._id_to_name[target]}")
             
             try:
-                route = self.find_optimal_route(start, end, 'combined')
+                route = self._route_by_ids(source, target, 'combined')
                 if route['success']:
                     sample_routes.append(route)
                     print(f"  Distance: {route['total_distance']:.2f}m")
@@ -427,13 +874,9 @@ class ComprehensiveFloodRiskRouter:
                 print("Cannot visualize: path too short")
                 return
             
-            x_coords = []
-            y_coords = []
-            
-            for node in path:
-                coords = node.split(',')
-                x_coords.append(float(coords[0]))
-                y_coords.append(float(coords[1]))
+            path_xy = self._node_xy[[self._name_to_id[node] for node in path]]
+            x_coords = path_xy[:, 0].tolist()
+            y_coords = path_xy[:, 1].tolist()
             
             # Plot the route
             ax.plot(x_coords, y_coords, 'r-', linewidth=3, label='Optimal Route')
@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for the Sheltr backend API
+
+Usage (from backend/): gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("SHELTR_BIND", "0.0.0.0:5000")
+
+# Safepoint/POI files are looked up relative to the backend directory
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+# One worker process per core, each serving requests from a few threads.
+# Cached payloads are plain buffer writes, so raising SHELTR_THREADS lets one
+# worker hold more slow clients at once; route searches still run one at a time
+workers = int(os.getenv("SHELTR_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("SHELTR_THREADS", 4))
+
+# Load models, graph and geometries once in the master; workers share them copy-on-write
+preload_app = True
+
+# Cold routes on the full graph can take several seconds
+timeout = 120
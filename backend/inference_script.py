@@ -4,22 +4,95 @@ Inference Script for Flood Risk Prediction
 Loads trained model and scores new road segments
 """
 
-import pandas as pd
 import numpy as np
 import joblib
-import geopandas as gpd
-import rasterio
+import copy
+import hashlib
+import heapq
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sklearn import config_context
 from pathlib import Path
+from functools import lru_cache
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:  # Fall back to sklearn's own tree traversal
+    ort = None
+
+# Longest HubName (as a string) a PRED_DTYPE record holds; OSM way ids are far shorter
+_HUB_NAME_WIDTH = 20
+
+# Compact per-segment prediction record returned by predict_multiple_segments;
+# HubNames are stored as strings, and pred_prob_unsafe is 1 - pred_prob_safe
+PRED_DTYPE = np.dtype([
+    ('HubName', f'U{_HUB_NAME_WIDTH}'),
+    ('pred_safe', np.int8),
+    ('pred_prob_safe', np.float32)
+])
+
+# Shared by all inference engines for row-parallel prediction on large batches
+_PREDICT_WORKERS = os.cpu_count() or 1
+_predict_pool = ThreadPoolExecutor(max_workers=_PREDICT_WORKERS)
+
 class FloodRiskInference:
-    def __init__(self, model_path="rf_model.joblib", scaler_path="scaler.joblib"):
-        """Initialize with trained model and scaler"""
+    # Feature layout: 6 base features followed by the landuse flags in this order
+    BASE_FEATURES = ('HubName', 'dist_to_river', 'elevation', 'rainfall_mm_3h', 'hazard_status', 'dist_to_poi')
+    LANDUSE_CLASSES = (
+        'park', 'retail', 'cemetery', 'industrial', 'commercial', 'forest',
+        'recreation_ground', 'scrub', 'residential', 'farmland', 'grass',
+        'military', 'meadow', 'farmyard', 'orchard', 'nature_reserve',
+        'allotments', 'heath'
+    )
+    _LANDUSE_KEYS = tuple(f'landuse_{landuse_class}' for landuse_class in LANDUSE_CLASSES)
+    N_FEATURES = len(BASE_FEATURES) + len(LANDUSE_CLASSES)
+    # Below this many rows, spreading trees over threads costs more than it saves
+    PARALLEL_MIN_ROWS = 256
+    # From this many rows, split the rows themselves across threads
+    ROW_SPLIT_MIN_ROWS = 2048
+    
+    def __init__(self, model_path="rf_model.joblib", scaler_path="scaler.joblib", use_onnx=None):
+        """
+        Initialize with trained model and scaler.
+        use_onnx selects ONNX Runtime inference when it is installed; by default
+        it is on unless the SHELTR_USE_ONNX environment variable is "0".
+        """
         self.model = joblib.load(model_path)
         self.scaler = joblib.load(scaler_path)
+        
+        # The forest may take only some of the scaler's columns (it was trained without HubName)
+        self._model_columns = self._align_model_columns()
+        
+        # Move the scaling into the split thresholds so prediction skips the scaler
+        self._scaler_folded = self._fold_scaler_into_trees()
+        
+        # Single rows stay on one thread; large batches use a view of the same trees on all cores
+        self.model.n_jobs = 1
+        self._parallel_model = copy.copy(self.model)
+        self._parallel_model.n_jobs = -1
+        
+        # Compiled copy of the forest for ONNX Runtime, when available and enabled.
+        # Only the converted model is built here; each process opens its own session
+        # on first use, since a session's thread pools don't survive fork
+        if use_onnx is None:
+            use_onnx = os.getenv("SHELTR_USE_ONNX", "1") != "0"
+        self._onnx_bytes = None
+        if use_onnx and ort is not None:
+            self._onnx_bytes = self._build_onnx_model(Path(model_path), Path(scaler_path))
+        self._onnx_session = None
+        self._onnx_pid = None
+        self._onnx_lock = threading.Lock()
         self.feature_names = None
         
+        # Segment features are mostly static, so repeat queries hit this cache instead of the model
+        self._cached_prediction = lru_cache(maxsize=4096)(self._predict_features)
+        
     def extract_features_from_segment(self, segment_data):
         """
         Extract features from a single road segment
@@ -38,29 +111,20 @@ class FloodRiskInference:
         Returns:
             numpy array of features ready for prediction
         """
+        features = np.empty((1, self.N_FEATURES), dtype=np.float64)
+        self._fill_features(segment_data, features[0])
+        return features
+    
+    def _fill_features(self, segment_data, out):
+        """Write a segment's features into a preallocated row of length N_FEATURES"""
         # Base features
-        features = [
-            segment_data.get('HubName', 0),
-            segment_data.get('dist_to_river', 0),
-            segment_data.get('elevation', 0),
-            segment_data.get('rainfall_mm_3h', 0),
-            segment_data.get('hazard_status', 0),
-            segment_data.get('dist_to_poi', 0)
-        ]
+        for i, key in enumerate(self.BASE_FEATURES):
+            out[i] = segment_data.get(key, 0)
         
         # Add landuse features (ensure consistent order)
-        landuse_classes = [
-            'park', 'retail', 'cemetery', 'industrial', 'commercial', 'forest',
-            'recreation_ground', 'scrub', 'residential', 'farmland', 'grass',
-            'military', 'meadow', 'farmyard', 'orchard', 'nature_reserve',
-            'allotments', 'heath'
-        ]
-        
         landuse_features = segment_data.get('landuse_features', {})
-        for landuse_class in landuse_classes:
-            features.append(landuse_features.get(f'landuse_{landuse_class}', 0))
-        
-        return np.array(features).reshape(1, -1)
+        for i, key in enumerate(self._LANDUSE_KEYS, start=len(self.BASE_FEATURES)):
+            out[i] = landuse_features.get(key, 0)
     
     def predict_single_segment(self, segment_data):
         """
@@ -78,12 +142,17 @@ class FloodRiskInference:
         # Extract features
         features = self.extract_features_from_segment(segment_data)
         
-        # Scale features
-        features_scaled = self.scaler.transform(features)
+        # Keyed by the exact feature vector; hand out a copy so the cached dict stays intact
+        return dict(self._cached_prediction(features.tobytes()))
+    
+    def _predict_features(self, features_key):
+        """Run the scaler and model on one packed float64 feature row"""
+        features = np.frombuffer(features_key, dtype=np.float64).reshape(1, -1)
         
-        # Predict
-        pred_safe = self.model.predict(features_scaled)[0]
-        pred_proba = self.model.predict_proba(features_scaled)[0]
+        # Predict; one predict_proba pass also gives the class label
+        pred_safe, pred_proba = self.predict_batch(features)
+        pred_safe = pred_safe[0]
+        pred_proba = pred_proba[0]
         
         return {
             'pred_safe': int(pred_safe),
@@ -99,23 +168,273 @@ class FloodRiskInference:
             segments_data: list of dicts, each with segment features
             
         Returns:
-            list of dicts with predictions
+            PRED_DTYPE structured array, one record per segment
+            (predictions_to_dicts gives the list-of-dicts form)
+        
+        Raises:
+            ValueError: if a segment has no HubName or one longer than the PRED_DTYPE field
         """
-        predictions = []
+        predictions = np.empty(len(segments_data), dtype=PRED_DTYPE)
+        if not segments_data:
+            return predictions
+        
+        # Check the ids before doing any model work
+        hub_names = []
         for segment in segments_data:
-            pred = self.predict_single_segment(segment)
-            pred['HubName'] = segment.get('HubName')
-            predictions.append(pred)
+            hub_name = segment.get('HubName')
+            if hub_name is None:
+                raise ValueError("Every segment needs a HubName")
+            hub_name = str(hub_name)
+            if len(hub_name) > _HUB_NAME_WIDTH:
+                raise ValueError(f"HubName longer than {_HUB_NAME_WIDTH} characters: {hub_name}")
+            hub_names.append(hub_name)
+        
+        # Stack every segment into one feature matrix so the scaler and model run once
+        features = np.empty((len(segments_data), self.N_FEATURES), dtype=np.float64)
+        for i, segment in enumerate(segments_data):
+            self._fill_features(segment, features[i])
+        
+        pred_safe, pred_proba = self.predict_batch(features)
         
+        predictions['HubName'] = hub_names
+        predictions['pred_safe'] = pred_safe
+        predictions['pred_prob_safe'] = pred_proba[:, 1]
         return predictions
+    
+    def predict_batch(self, features):
+        """
+        Predict safety for a feature matrix
+        
+        Args:
+            features: (N, N_FEATURES) array laid out like extract_features_from_segment
+            
+        Returns:
+            (pred_safe, pred_proba): (N,) class labels and (N, 2) class probabilities
+        
+        Raises:
+            ValueError: if features has the wrong shape or holds NaN/inf
+        """
+        # The model skips sklearn's own input validation, so check what it would have
+        features = np.asarray(features)
+        if features.ndim != 2 or features.shape[1] != self.N_FEATURES:
+            raise ValueError(f"Expected features of shape (N, {self.N_FEATURES}), got {features.shape}")
+        if not np.isfinite(features).all():
+            raise ValueError("Features contain NaN or infinite values")
+        
+        with config_context(assume_finite=True):
+            features_scaled = self._scale(features)
+            if features_scaled.shape[1] != self.model.n_features_in_:
+                raise ValueError(
+                    f"Model expects {self.model.n_features_in_} features, got {features_scaled.shape[1]}"
+                )
+            
+            # predict() is argmax over predict_proba, so derive it instead of traversing the trees twice
+            session = self._get_onnx_session()
+            if session is not None:
+                pred_proba = session.run(
+                    ['probabilities'], {'features': features_scaled}
+                )[0].astype(np.float64)
+            elif len(features) >= self.ROW_SPLIT_MIN_ROWS and _PREDICT_WORKERS > 1:
+                pred_proba = self._predict_proba_row_split(features_scaled)
+            else:
+                model = self._parallel_model if len(features) >= self.PARALLEL_MIN_ROWS else self.model
+                pred_proba = model.predict_proba(features_scaled)
+        pred_safe = self.model.classes_[pred_proba.argmax(axis=1)]
+        
+        return pred_safe, pred_proba
+    
+    def _predict_proba_row_split(self, features_scaled):
+        """
+        predict_proba over row slabs in parallel threads. Tree traversal releases
+        the GIL; each slab uses the single-threaded model to avoid nested pools.
+        """
+        slabs = np.array_split(features_scaled, _PREDICT_WORKERS)
+        
+        # config_context is thread-local, so re-enter it inside each worker
+        def predict_slab(slab):
+            with config_context(assume_finite=True):
+                return self.model.predict_proba(slab)
+        
+        return np.vstack(list(_predict_pool.map(predict_slab, slabs)))
+    
+    def _get_onnx_session(self):
+        """
+        This process's ONNX Runtime session, opened on first use; None if it
+        couldn't be opened or disagrees with predict_proba. A session opened
+        before a fork (e.g. in a preloading Gunicorn master) is never reused.
+        """
+        if self._onnx_bytes is None:
+            return None
+        pid = os.getpid()
+        if self._onnx_pid != pid:
+            with self._onnx_lock:
+                if self._onnx_pid != pid:
+                    self._onnx_session = self._build_onnx_session(self._onnx_bytes)
+                    self._onnx_pid = pid
+        return self._onnx_session
+    
+    def _build_onnx_session(self, onnx_bytes):
+        """ONNX Runtime session for the converted forest, checked against predict_proba"""
+        try:
+            session = ort.InferenceSession(onnx_bytes, providers=['CPUExecutionProvider'])
+        except Exception as e:
+            print(f"Could not open ONNX model, using scikit-learn: {e}")
+            return None
+        if not self._onnx_matches_model(session):
+            print("ONNX model output differs from scikit-learn, using scikit-learn")
+            return None
+        print("Using ONNX Runtime for model inference")
+        return session
+    
+    def _build_onnx_model(self, model_path, scaler_path):
+        """
+        Serialized ONNX model of the forest; None if it can't be converted. The
+        converted model is saved next to the .joblib file, with a .json record of
+        its input width and the hashes of the model and scaler files, and reused
+        while those still match.
+        """
+        n_inputs = self.model.n_features_in_
+        if len(self._model_columns) != n_inputs:
+            print(f"Model takes {n_inputs} features but {len(self._model_columns)} are prepared, using scikit-learn")
+            return None
+        
+        onnx_path = model_path.with_suffix('.onnx')
+        meta_path = onnx_path.with_suffix('.onnx.json')
+        try:
+            meta = {
+                'n_features': int(n_inputs),
+                'scaler_folded': self._scaler_folded,
+                'model_sha256': hashlib.sha256(model_path.read_bytes()).hexdigest(),
+                'scaler_sha256': hashlib.sha256(scaler_path.read_bytes()).hexdigest(),
+            }
+            try:
+                cached_meta = json.loads(meta_path.read_text())
+            except (OSError, ValueError):
+                cached_meta = None
+            
+            if cached_meta == meta and onnx_path.exists():
+                onnx_bytes = onnx_path.read_bytes()
+                print(f"Loaded ONNX model from {onnx_path}")
+            else:
+                onnx_bytes = convert_sklearn(
+                    self.model,
+                    initial_types=[('features', FloatTensorType([None, n_inputs]))],
+                    options={id(self.model): {'zipmap': False}}
+                ).SerializeToString()
+                try:
+                    onnx_path.write_bytes(onnx_bytes)
+                    meta_path.write_text(json.dumps(meta))
+                except OSError as e:
+                    print(f"Could not save ONNX model to {onnx_path}: {e}")
+            return onnx_bytes
+        except Exception as e:
+            print(f"ONNX conversion failed, using scikit-learn: {e}")
+            return None
+    
+    def _onnx_matches_model(self, session, n_rows=64):
+        """
+        Compare the session against model.predict_proba on a fixed set of rows
+        spread around the scaler's fitted statistics.
+        """
+        rng = np.random.RandomState(0)
+        mean = self.scaler.mean_ if self.scaler.mean_ is not None else np.zeros(self.N_FEATURES)
+        scale = self.scaler.scale_ if self.scaler.scale_ is not None else np.ones(self.N_FEATURES)
+        features_scaled = self._scale(mean + rng.randn(n_rows, self.N_FEATURES) * scale)
+        
+        expected = self.model.predict_proba(features_scaled)
+        actual = session.run(['probabilities'], {'features': features_scaled})[0]
+        return actual.shape == expected.shape and np.allclose(actual, expected, atol=1e-4)
+    
+    def _align_model_columns(self):
+        """
+        Index of the scaler output column that feeds each model input.
+        The scaler takes the full N_FEATURES layout; the forest may have been
+        trained on a subset of it. Columns are matched by name when both were
+        fitted with feature names, otherwise the widths must agree. Raises
+        ValueError if the layouts can't be reconciled.
+        """
+        layout = list(self.BASE_FEATURES) + list(self._LANDUSE_KEYS)
+        scaler_names = getattr(self.scaler, 'feature_names_in_', None)
+        model_names = getattr(self.model, 'feature_names_in_', None)
+        
+        if self.scaler.n_features_in_ != self.N_FEATURES:
+            raise ValueError(
+                f"Scaler expects {self.scaler.n_features_in_} features, feature builder makes {self.N_FEATURES}"
+            )
+        if scaler_names is not None and list(scaler_names) != layout:
+            raise ValueError("Scaler feature names don't match the feature builder layout")
+        
+        if scaler_names is not None and model_names is not None:
+            position = {name: i for i, name in enumerate(layout)}
+            missing = [name for name in model_names if name not in position]
+            if missing:
+                raise ValueError(f"Model features missing from the feature builder: {missing}")
+            return np.array([position[name] for name in model_names], dtype=np.intp)
+        
+        if self.model.n_features_in_ != self.N_FEATURES:
+            raise ValueError(
+                f"Model expects {self.model.n_features_in_} features, feature builder makes {self.N_FEATURES}, "
+                "and there are no feature names to match them by"
+            )
+        return np.arange(self.N_FEATURES)
+    
+    def _fold_scaler_into_trees(self):
+        """
+        Rewrite each split threshold from scaled units back to raw feature units.
+        A tree split x_scaled <= t is the same test as x <= t * scale + mean, so
+        after this the trees take unscaled features (model columns only, see
+        _align_model_columns). Returns False (and leaves the model untouched) if
+        the model isn't a forest of decision trees or the scaler isn't a
+        StandardScaler.
+        """
+        estimators = getattr(self.model, 'estimators_', None)
+        if not estimators or not all(hasattr(est, 'tree_') for est in estimators):
+            return False
+        if not hasattr(self.scaler, 'mean_'):
+            return False
+        
+        # Scaler statistics of the column each model input comes from
+        # (mean_ is still fitted under with_mean=False but transform doesn't subtract it)
+        n_features = self.scaler.n_features_in_
+        with_mean = getattr(self.scaler, 'with_mean', True) and self.scaler.mean_ is not None
+        with_std = getattr(self.scaler, 'with_std', True) and self.scaler.scale_ is not None
+        mean = self.scaler.mean_ if with_mean else np.zeros(n_features)
+        scale = self.scaler.scale_ if with_std else np.ones(n_features)
+        mean = np.asarray(mean)[self._model_columns]
+        scale = np.asarray(scale)[self._model_columns]
+        
+        for est in estimators:
+            tree = est.tree_
+            # threshold is a writable view onto the tree's node array
+            threshold = tree.threshold
+            split = tree.feature >= 0
+            features = tree.feature[split]
+            threshold[split] = threshold[split] * scale[features] + mean[features]
+        
+        print(f"Folded feature scaling into {len(estimators)} trees")
+        return True
+    
+    def _scale(self, features):
+        """
+        Prepare features for the trees: the model's columns as float32, the dtype
+        they compare against. Scaling only runs if it couldn't be folded into the
+        thresholds. Call inside assume_finite: inputs are not checked for NaN/inf,
+        so callers must pass finite features.
+        """
+        if self._scaler_folded:
+            return np.take(features, self._model_columns, axis=1).astype(np.float32)
+        return self.scaler.transform(features)[:, self._model_columns].astype(np.float32)
 
 def score_route_safety(route_segments, segment_predictions):
     """
     Score overall route safety based on segment predictions
     
     Args:
-        route_segments: list of HubNames representing route
-        segment_predictions: dict mapping HubName to prediction results
+        route_segments: list of HubNames representing route, or an integer array of
+            segment ids from route_to_ids (skips per-segment HubName lookups)
+        segment_predictions: (hub_to_idx, pred_safe, pred_prob_safe) arrays from
+            load_segment_predictions, a PRED_DTYPE array from predict_multiple_segments,
+            or a dict mapping HubName to prediction results
         
     Returns:
         dict with route safety metrics:
@@ -124,22 +443,27 @@ def score_route_safety(route_segments, segment_predictions):
             - unsafe_segments: list of unsafe segment IDs
             - safe_segments: list of safe segment IDs
     """
-    safe_segments = []
-    unsafe_segments = []
-    safety_probs = []
-    
-    for segment_id in route_segments:
-        if segment_id in segment_predictions:
-            pred = segment_predictions[segment_id]
-            safety_probs.append(pred['pred_prob_safe'])
-            
-            if pred['pred_safe'] == 1:
-                safe_segments.append(segment_id)
-            else:
-                unsafe_segments.append(segment_id)
+    if isinstance(segment_predictions, (dict, np.ndarray)):
+        segment_predictions = predictions_to_arrays(segment_predictions)
+    hub_to_idx, pred_safe, pred_prob_safe = segment_predictions
+    
+    # Resolve the route to prediction rows once, then work on whole arrays
+    if isinstance(route_segments, np.ndarray) and route_segments.dtype.kind in 'iu':
+        idx = route_segments
+        route_segments = route_segments.tolist()
+    else:
+        idx = route_to_ids(route_segments, segment_predictions)
+    found = np.flatnonzero(idx >= 0)
+    idx = idx[found]
+    
+    safety_probs = pred_prob_safe[idx]
+    safe_mask = pred_safe[idx] == 1
+    
+    safe_segments = [route_segments[i] for i in found[safe_mask].tolist()]
+    unsafe_segments = [route_segments[i] for i in found[~safe_mask].tolist()]
     
     route_safe = 1 if len(unsafe_segments) == 0 else 0
-    route_score = np.mean(safety_probs) if safety_probs else 0.0
+    route_score = safety_probs.mean() if safety_probs.size else 0.0
     
     return {
         'route_safe': route_safe,
@@ -151,6 +475,54 @@ def score_route_safety(route_segments, segment_predictions):
         'safe_count': len(safe_segments)
     }
 
+def route_to_ids(route_segments, segment_predictions):
+    """
+    Convert a route of HubNames to integer segment ids for score_route_safety.
+    HubNames without a prediction map to -1.
+    """
+    hub_to_idx = segment_predictions[0]
+    return np.fromiter(
+        (hub_to_idx.get(segment_id, -1) for segment_id in route_segments),
+        dtype=np.intp, count=len(route_segments)
+    )
+
+def predictions_to_dicts(predictions):
+    """Convert a PRED_DTYPE array from predict_multiple_segments to a list of prediction dicts"""
+    pred_prob_safe = predictions['pred_prob_safe']
+    return [
+        {
+            'pred_safe': pred_safe,
+            'pred_prob_safe': pred_prob_safe,
+            'pred_prob_unsafe': pred_prob_unsafe,
+            'HubName': hub_name
+        }
+        for hub_name, pred_safe, pred_prob_safe, pred_prob_unsafe in zip(
+            predictions['HubName'].tolist(), predictions['pred_safe'].tolist(),
+            pred_prob_safe.tolist(), (1 - pred_prob_safe).tolist()
+        )
+    ]
+
+def predictions_to_arrays(segment_predictions):
+    """
+    Convert a dict mapping HubName to prediction results, or a PRED_DTYPE array,
+    into the (hub_to_idx, pred_safe, pred_prob_safe) layout used by score_route_safety
+    """
+    if isinstance(segment_predictions, np.ndarray):
+        # Later records for a HubName overwrite earlier ones, as with a dict
+        hub_to_idx = {hub_name: i for i, hub_name in enumerate(segment_predictions['HubName'].tolist())}
+        return hub_to_idx, segment_predictions['pred_safe'], segment_predictions['pred_prob_safe']
+    
+    hub_to_idx = {hub_name: i for i, hub_name in enumerate(segment_predictions)}
+    pred_safe = np.fromiter(
+        (pred['pred_safe'] for pred in segment_predictions.values()),
+        dtype=np.int8, count=len(segment_predictions)
+    )
+    pred_prob_safe = np.fromiter(
+        (pred['pred_prob_safe'] for pred in segment_predictions.values()),
+        dtype=np.float64, count=len(segment_predictions)
+    )
+    return hub_to_idx, pred_safe, pred_prob_safe
+
 def load_segment_predictions(predictions_file="segments_safe_min.csv"):
     """
     Load pre-computed segment predictions for fast lookup
@@ -159,19 +531,31 @@ def load_segment_predictions(predictions_file="segments_safe_min.csv"):
         predictions_file: path to CSV with predictions
         
     Returns:
-        dict mapping HubName to prediction results
+        (hub_to_idx, pred_safe, pred_prob_safe): dict mapping HubName to an
+        integer segment id, and the prediction arrays indexed by that id
     """
-    df = pd.read_csv(predictions_file)
-    predictions = {}
-    
-    for _, row in df.iterrows():
-        predictions[str(row['HubName'])] = {
-            'pred_safe': int(row['pred_safe']),
-            'pred_prob_safe': float(row['pred_prob_safe']),
-            'pred_prob_unsafe': 1.0 - float(row['pred_prob_safe'])
-        }
+    # Only needed here; keeps pandas out of the import cost for scoring-only callers
+    import pandas as pd
+    
+    df = pd.read_csv(
+        predictions_file,
+        usecols=['HubName', 'pred_safe', 'pred_prob_safe'],
+        dtype={'HubName': str, 'pred_safe': np.int8, 'pred_prob_safe': np.float64}
+    )
+    
+    # Later rows for a HubName overwrite earlier ones
+    df = df.drop_duplicates('HubName', keep='last')
     
-    return predictions
+    # Intern HubNames as small integer ids (category codes) and lay the predictions out by id
+    hub_names = pd.Categorical(df['HubName'])
+    num_hubs = len(hub_names.categories)
+    pred_safe = np.zeros(num_hubs, dtype=np.int8)
+    pred_prob_safe = np.zeros(num_hubs, dtype=np.float64)
+    pred_safe[hub_names.codes] = df['pred_safe'].to_numpy()
+    pred_prob_safe[hub_names.codes] = df['pred_prob_safe'].to_numpy()
+    
+    hub_to_idx = dict(zip(hub_names.categories.tolist(), range(num_hubs)))
+    return hub_to_idx, pred_safe, pred_prob_safe
 
 def find_safe_alternative_routes(start_point, end_point, road_network, segment_predictions, max_alternatives=3):
     """
@@ -191,7 +575,7 @@ def find_safe_alternative_routes(start_point, end_point, road_network, segment_p
     # like OSRM, GraphHopper, or NetworkX
     
     # Placeholder implementation
-    alternatives = []
+    candidate_routes = []
     
     # Example: find routes and score them
     # route1 = find_shortest_path(start_point, end_point, road_network)
@@ -199,17 +583,16 @@ def find_safe_alternative_routes(start_point, end_point, road_network, segment_p
     # etc.
     
     # Score each route
-    for route_segments in alternatives:
+    scored = []
+    for route_segments in candidate_routes:
         route_score = score_route_safety(route_segments, segment_predictions)
-        alternatives.append({
+        scored.append({
             'route_segments': route_segments,
             'route_score': route_score
         })
     
-    # Sort by safety score (highest first)
-    alternatives.sort(key=lambda x: x['route_score']['route_score'], reverse=True)
-    
-    return alternatives[:max_alternatives]
+    # Best safety scores first; only the top max_alternatives need ordering
+    return heapq.nlargest(max_alternatives, scored, key=lambda x: x['route_score']['route_score'])
 
 # Example usage
 if __name__ == "__main__":
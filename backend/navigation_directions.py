@@ -5,8 +5,28 @@ Converts route coordinates into human-readable step-by-step directions
 """
 
 import math
+import numpy as np
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
 from typing import List, Dict, Tuple
 
+try:
+    from numba import njit
+except ImportError:  # Fall back to the pure-Python geometry helpers
+    njit = None
+
+# Cardinal directions for each 45 degree sector, starting at North
+_DIRECTIONS = ('North', 'Northeast', 'East', 'Southeast', 'South', 'Southwest', 'West', 'Northwest')
+
+# Turn severity buckets by absolute angle: <20, <45, <135, and sharper
+_TURN_THRESHOLDS = (20, 45, 135)
+_TURN_INSTRUCTIONS = (
+    # Left turns (and straight ahead), indexed by severity bucket
+    ("Continue straight", "Bear slight left", "Turn left", "Make a sharp left turn"),
+    # Right turns
+    ("Continue straight", "Bear slight right", "Turn right", "Make a sharp right turn")
+)
+
 def calculate_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate bearing between two points in degrees (0-360)"""
     lat1_rad = math.radians(lat1)
@@ -36,11 +56,22 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     return R * c
 
+def calculate_distance_fast(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Approximate distance in meters using the equirectangular projection.
+    Within a few km this agrees with Haversine to well under a meter, using one cos and one sqrt.
+    """
+    R = 6371000  # Earth's radius in meters
+    
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    
+    return R * math.sqrt(x * x + y * y)
+
 def bearing_to_direction(bearing: float) -> str:
     """Convert bearing to cardinal direction"""
-    directions = ['North', 'Northeast', 'East', 'Southeast', 'South', 'Southwest', 'West', 'Northwest']
     index = round(bearing / 45) % 8
-    return directions[index]
+    return _DIRECTIONS[index]
 
 def calculate_turn_angle(bearing1: float, bearing2: float) -> float:
     """Calculate turn angle between two bearings (-180 to 180)"""
@@ -53,16 +84,8 @@ def calculate_turn_angle(bearing1: float, bearing2: float) -> float:
 
 def get_turn_instruction(turn_angle: float) -> str:
     """Convert turn angle to instruction"""
-    abs_angle = abs(turn_angle)
-    
-    if abs_angle < 20:
-        return "Continue straight"
-    elif abs_angle < 45:
-        return "Bear slight right" if turn_angle > 0 else "Bear slight left"
-    elif abs_angle < 135:
-        return "Turn right" if turn_angle > 0 else "Turn left"
-    else:
-        return "Make a sharp right turn" if turn_angle > 0 else "Make a sharp left turn"
+    side = 1 if turn_angle > 0 else 0
+    return _TURN_INSTRUCTIONS[side][bisect_right(_TURN_THRESHOLDS, abs(turn_angle))]
 
 def simplify_route_points(coordinates: List[List[float]], min_distance: float = 50) -> List[List[float]]:
     """Simplify route by removing points that are too close together"""
@@ -70,18 +93,96 @@ def simplify_route_points(coordinates: List[List[float]], min_distance: float =
         return coordinates
     
     simplified = [coordinates[0]]
+    for _, k, _ in _kept_legs(coordinates, min_distance):
+        simplified.append(coordinates[k])
+    return simplified
+
+def _kept_legs(coordinates: List[List[float]], min_distance: float):
+    """
+    Yield (from index, to index, distance) for each leg between points kept by simplify_route_points
+    
+    Segment lengths along the whole polyline come from one vectorized pass.
+    The straight-line distance from the last kept point never exceeds the path length
+    to it, so points still within min_distance along the path are skipped unmeasured.
+    The threshold test uses the equirectangular approximation; kept legs are then
+    measured with Haversine.
+    """
+    coords = np.asarray(coordinates, dtype=np.float64)
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    x = np.diff(lon) * np.cos((lat[:-1] + lat[1:]) / 2)
+    segment_lengths = 6371000 * np.hypot(x, np.diff(lat))
+    path_length = np.concatenate(([0.0], np.cumsum(segment_lengths))).tolist()
     
-    for i in range(1, len(coordinates)):
-        prev_lat, prev_lon = simplified[-1]
-        curr_lat, curr_lon = coordinates[i]
+    last = len(coordinates) - 1
+    i = 0
+    while i < last:
+        prev_lat, prev_lon = coordinates[i]
         
-        distance = calculate_distance(prev_lat, prev_lon, curr_lat, curr_lon)
+        # First candidate far enough along the path; slack absorbs rounding in the running sum
+        k = bisect_left(path_length, path_length[i] + min_distance - 1e-6, i + 1, last)
+        while True:
+            curr_lat, curr_lon = coordinates[k]
+            
+            # Keep point if it's far enough or if it's the last point
+            if calculate_distance_fast(prev_lat, prev_lon, curr_lat, curr_lon) >= min_distance or k == last:
+                break
+            k += 1
+        
+        yield i, k, calculate_distance(prev_lat, prev_lon, curr_lat, curr_lon)
+        i = k
+
+def _simplify_and_measure(lat, lon, min_distance):
+    """
+    Simplify a polyline and measure its legs in one pass.
+    Returns the kept point indices plus the length and bearing of each leg
+    between consecutive kept points.
+    """
+    n = lat.shape[0]
+    keep = np.empty(n, dtype=np.int64)
+    leg_distances = np.empty(n, dtype=np.float64)
+    leg_bearings = np.empty(n, dtype=np.float64)
+    
+    keep[0] = 0
+    count = 1
+    for i in range(1, n):
+        prev = keep[count - 1]
         
         # Keep point if it's far enough or if it's the last point
-        if distance >= min_distance or i == len(coordinates) - 1:
-            simplified.append(coordinates[i])
+        if _fast_distance(lat[prev], lon[prev], lat[i], lon[i]) >= min_distance or i == n - 1:
+            leg_distances[count - 1] = _haversine(lat[prev], lon[prev], lat[i], lon[i])
+            leg_bearings[count - 1] = _bearing(lat[prev], lon[prev], lat[i], lon[i])
+            keep[count] = i
+            count += 1
     
-    return simplified
+    return keep[:count], leg_distances[:count - 1], leg_bearings[:count - 1]
+
+
+if njit is not None:
+    _haversine = njit(cache=True, nogil=True)(calculate_distance)
+    _fast_distance = njit(cache=True, nogil=True)(calculate_distance_fast)
+    _bearing = njit(cache=True, nogil=True)(calculate_bearing)
+    _simplify_and_measure = njit(cache=True, nogil=True)(_simplify_and_measure)
+else:
+    _haversine = calculate_distance
+    _fast_distance = calculate_distance_fast
+    _bearing = calculate_bearing
+
+def _walk_polyline(coords: np.ndarray, min_distance: float):
+    """
+    Simplify a route and measure it in a single pass.
+    Yields (start point, end point, distance, bearing) for each leg between kept points.
+    """
+    if njit is not None:
+        keep, leg_distances, leg_bearings = _simplify_and_measure(coords[:, 0], coords[:, 1], min_distance)
+        points = coords[keep].tolist()
+        yield from zip(points, points[1:], leg_distances.tolist(), leg_bearings.tolist())
+        return
+    
+    route_coords = coords.tolist()
+    for i, k, distance in _kept_legs(route_coords, min_distance):
+        start, end = route_coords[i], route_coords[k]
+        yield start, end, distance, calculate_bearing(start[0], start[1], end[0], end[1])
 
 def generate_turn_by_turn_directions(route_coords: List[List[float]], 
                                      segment_names: List[str] = None) -> List[Dict]:
@@ -94,94 +195,93 @@ def generate_turn_by_turn_directions(route_coords: List[List[float]],
         
     Returns:
         List of direction steps with instructions, distance, and bearing
+        
+    Raises:
+        ValueError: if route_coords is not a list of [lat, lng] pairs
     """
     if len(route_coords) < 2:
         return []
     
-    # Simplify route to key turning points
-    simplified_coords = simplify_route_points(route_coords, min_distance=30)
+    coords = np.asarray(route_coords, dtype=np.float64)
+    if coords.ndim != 2 or coords.shape[1] != 2:
+        raise ValueError(f"route_coords must be [lat, lng] pairs, got shape {coords.shape}")
     
-    directions = []
-    total_distance = 0
+    # The same route is often requested repeatedly, so directions are memoized by content
+    names = tuple(segment_names) if segment_names else None
     
-    # Starting instruction
-    if len(simplified_coords) >= 2:
-        initial_bearing = calculate_bearing(
-            simplified_coords[0][0], simplified_coords[0][1],
-            simplified_coords[1][0], simplified_coords[1][1]
-        )
-        initial_direction = bearing_to_direction(initial_bearing)
-        
-        directions.append({
-            'step': 1,
-            'instruction': f"Head {initial_direction}",
-            'distance': 0,
-            'total_distance': 0,
-            'coordinates': simplified_coords[0],
-            'bearing': initial_bearing,
-            'type': 'start'
-        })
+    # Hand out copies so callers can't modify the cached steps
+    return [
+        dict(step, coordinates=list(step['coordinates']))
+        for step in _cached_directions(coords.tobytes(), names)
+    ]
+
+@lru_cache(maxsize=1024)
+def _cached_directions(coords_key: bytes, segment_names: Tuple[str, ...] = None) -> Tuple[Dict, ...]:
+    """Build the direction steps for a route given as packed float64 (lat, lng) pairs"""
+    coords = np.frombuffer(coords_key, dtype=np.float64).reshape(-1, 2)
     
-    # Generate turn instructions
-    prev_bearing = initial_bearing if len(simplified_coords) >= 2 else 0
+    directions = []
+    total_distance = 0
     step_num = 2
     
-    for i in range(1, len(simplified_coords) - 1):
-        curr_lat, curr_lon = simplified_coords[i]
-        next_lat, next_lon = simplified_coords[i + 1]
-        prev_lat, prev_lon = simplified_coords[i - 1]
-        
-        # Calculate distance from previous point
-        segment_distance = calculate_distance(prev_lat, prev_lon, curr_lat, curr_lon)
-        total_distance += segment_distance
-        
-        # Calculate bearing to next point
-        curr_bearing = calculate_bearing(curr_lat, curr_lon, next_lat, next_lon)
-        
-        # Calculate turn angle
-        turn_angle = calculate_turn_angle(prev_bearing, curr_bearing)
-        
-        # Only add instruction if there's a significant turn
-        if abs(turn_angle) > 20:
-            instruction = get_turn_instruction(turn_angle)
-            
-            # Add street name if available
-            if segment_names and i < len(segment_names) and segment_names[i]:
-                instruction += f" onto {segment_names[i]}"
-            
+    # Walk the simplified route leg by leg; leg i starts at kept point i
+    for i, (start, end, leg_distance, leg_bearing) in enumerate(_walk_polyline(coords, min_distance=30)):
+        if i == 0:
+            # Starting instruction
             directions.append({
-                'step': step_num,
-                'instruction': instruction,
-                'distance': round(segment_distance, 1),
-                'total_distance': round(total_distance, 1),
-                'coordinates': [curr_lat, curr_lon],
-                'bearing': curr_bearing,
-                'turn_angle': round(turn_angle, 1),
-                'type': 'turn'
+                'step': 1,
+                'instruction': f"Head {bearing_to_direction(leg_bearing)}",
+                'distance': 0,
+                'total_distance': 0,
+                'coordinates': start,
+                'bearing': leg_bearing,
+                'type': 'start'
             })
-            step_num += 1
+        else:
+            # Distance from previous point
+            segment_distance = prev_distance
+            total_distance += segment_distance
+            
+            # Calculate turn angle
+            turn_angle = calculate_turn_angle(prev_bearing, leg_bearing)
+            
+            # Only add instruction if there's a significant turn
+            if abs(turn_angle) > 20:
+                instruction = get_turn_instruction(turn_angle)
+                
+                # Add street name if available
+                if segment_names and i < len(segment_names) and segment_names[i]:
+                    instruction += f" onto {segment_names[i]}"
+                
+                directions.append({
+                    'step': step_num,
+                    'instruction': instruction,
+                    'distance': round(segment_distance, 1),
+                    'total_distance': round(total_distance, 1),
+                    'coordinates': list(start),
+                    'bearing': leg_bearing,
+                    'turn_angle': round(turn_angle, 1),
+                    'type': 'turn'
+                })
+                step_num += 1
         
-        prev_bearing = curr_bearing
+        prev_bearing, prev_distance, destination = leg_bearing, leg_distance, end
     
     # Final destination instruction
-    if len(simplified_coords) >= 2:
-        final_distance = calculate_distance(
-            simplified_coords[-2][0], simplified_coords[-2][1],
-            simplified_coords[-1][0], simplified_coords[-1][1]
-        )
-        total_distance += final_distance
+    if directions:
+        total_distance += prev_distance
         
         directions.append({
             'step': step_num,
             'instruction': "You have arrived at your destination",
-            'distance': round(final_distance, 1),
+            'distance': round(prev_distance, 1),
             'total_distance': round(total_distance, 1),
-            'coordinates': simplified_coords[-1],
+            'coordinates': destination,
             'bearing': prev_bearing,
             'type': 'destination'
         })
     
-    return directions
+    return tuple(directions)
 
 def format_distance(meters: float) -> str:
     """Format distance in human-readable form"""
@@ -5,17 +5,52 @@ Integrates ML flood risk prediction with React Native frontend
 """
 
 from flask import Flask, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import joblib
 import json
+import gzip
+import hashlib
 import os
+import queue
+import threading
+import time
 from pathlib import Path
 from typing import Optional
+from functools import lru_cache
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 import geopandas as gpd
+import shapely
 from shapely.geometry import Point
+from pyproj import Transformer
 import warnings
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    # Fall back to a linear scan over safe_points_utm
+    cKDTree = None
+try:
+    from numba import njit
+except ImportError:  # Fall back to the Python nearest-safepoint loop
+    njit = None
+try:
+    from rtree import index as rtree_index
+except ImportError:
+    # Fall back to a NumPy scan over the evacuation center coordinates
+    rtree_index = None
+try:
+    import brotli
+except ImportError:
+    # Fall back to gzip-only precompression
+    brotli = None
+try:
+    import orjson
+except ImportError:
+    # Fall back to Flask's JSON provider
+    orjson = None
 warnings.filterwarnings('ignore')
 
 # Import our ML components
@@ -23,9 +58,116 @@ from comprehensive_route_calculator import ComprehensiveFloodRiskRouter
 from inference_script import FloodRiskInference, load_segment_predictions, score_route_safety
 from navigation_directions import generate_turn_by_turn_directions, get_direction_summary
 
+# WGS84 <-> UTM Zone 51N transformers, built once and shared by all requests
+_T_FWD = Transformer.from_crs("EPSG:4326", "EPSG:32651", always_xy=True)
+_T_INV = Transformer.from_crs("EPSG:32651", "EPSG:4326", always_xy=True)
+
+# Route responses are cached per (start cell, end cell, cost function) on this UTM grid
+ROUTE_CACHE_GRID_M = 10.0
+ROUTE_CACHE_SIZE = 2048
+# Cost functions the router builds edge weights for; others are rejected before the cache lookup
+COST_FUNCTIONS = ('distance', 'safety', 'combined', 'flood_risk')
+
+# Route searches run on one dedicated thread: find_optimal_route swaps the router's
+# active graph per cost function, so concurrent calls would race on that state
+_route_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='route')
+
+# Nearest-segment lookups for /api/predict are coalesced into batches of up to this size.
+# With a zero window a batch holds the requests that queued while the previous one ran;
+# a few milliseconds trades single-request latency for larger batches under load
+PREDICT_BATCH_WINDOW_S = 0.0
+PREDICT_BATCH_MAX = 256
+# Points farther than this from every road segment get a "no data" prediction (risk_level 'unknown')
+PREDICT_MAX_DISTANCE_M = 500.0
+
+# Up to this many evacuation centers, bbox queries use a flat grid hash instead of the R-tree
+CENTERS_GRID_MAX_N = 5000
+CENTERS_GRID_CELL_DEG = 0.01  # ~1 km
+
+
+class _MicroBatcher:
+    """Coalesce concurrent single-item calls into one call of a batch function.
+
+    There is no background thread: whichever caller holds the lock drains the
+    queue for everyone waiting, so it is safe to create before a fork.
+    """
+    
+    def __init__(self, batch_fn, window_s: float = 0.0, max_batch: int = 256):
+        self._batch_fn = batch_fn
+        self._window_s = window_s
+        self._max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+    
+    def __call__(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        while not future.done():
+            with self._lock:
+                if future.done():
+                    break
+                if self._window_s:
+                    time.sleep(self._window_s)
+                self._flush()
+        return future.result()
+    
+    def _flush(self):
+        batch = []
+        while len(batch) < self._max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            results = self._batch_fn([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+
+class OrjsonJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, keeping Flask's key sorting and type fallbacks."""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        # Only response()'s own formatting arguments map onto orjson options
+        if orjson is None or not set(kwargs) <= {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        # Datetimes go through Flask's default so they keep the HTTP date format
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonJSONProvider(app)
 CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
 
+def _dumps(obj) -> bytes:
+    """Serialize obj to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return app.json.dumps(obj).encode('utf-8')
+
+
+def fast_jsonify(obj, status: int = 200):
+    """jsonify() for large payloads; skips the stdlib json encoder when possible."""
+    return app.response_class(_dumps(obj), status=status, mimetype='application/json')
+
+
 # Error handlers
 @app.errorhandler(Exception)
 def handle_error(e):
@@ -45,7 +187,24 @@ ml_inference = None
 router = None
 segments_data = None
 safe_points_utm = None  # List of (x, y) tuples in EPSG:32651
+safe_points_arr = None  # (N, 2) float64 array of safe_points_utm
+safe_points_tree = None  # cKDTree over safe_points_arr
 segments_geometries = None  # GeoDataFrame with road geometries
+_seg_vertices = np.empty((0, 2))  # [lat, lng] vertices of all road geometries, stored back to back
+_seg_span_by_hub = {}  # HubName -> (first row, row count) in _seg_vertices (first match wins)
+_segments_geojson_bytes = None  # Serialized /api/segments payload
+segments_xy = None  # (N, 2) segment positions in EPSG:32651
+segments_rows = None  # segments_data row for each entry of segments_xy
+segments_tree = None  # cKDTree over segments_xy
+segment_lines = None  # Road geometries (EPSG:32651) aligned with segments_rows, R-tree indexed
+_centers_lat = np.empty(0)  # Evacuation center latitudes (EPSG:4326)
+_centers_lng = np.empty(0)  # Evacuation center longitudes, aligned with _centers_lat
+_centers_attrs = {}  # 'id' / 'name' / 'capacity' / 'safety_score' -> per-center list
+centers_index = None  # R-tree over center (lng, lat); ids are positions in _centers_lat
+_centers_grid = None  # (lat cell, lng cell) -> center positions, when the grid is used instead
+_evacuation_centers_bytes = None  # Serialized full /api/evacuation-centers payload
+_evacuation_centers_encoded = {}  # Content-Encoding -> precompressed payload, in preference order
+_evacuation_centers_etag = None  # SHA-1 of _evacuation_centers_bytes
 
 def _read_safepoints_anywhere() -> Optional[gpd.GeoDataFrame]:
     """Try to read safepoints from a user-provided file or common defaults.
@@ -100,11 +259,358 @@ def _read_safepoints_anywhere() -> Optional[gpd.GeoDataFrame]:
     return None
 
 
+def _nearest_index(pts, ux, uy):
+    """Index of the row of pts (N x 2) closest to (ux, uy); first one wins on ties."""
+    best = 0
+    best_d = np.inf
+    for i in range(pts.shape[0]):
+        dx = pts[i, 0] - ux
+        dy = pts[i, 1] - uy
+        d = dx * dx + dy * dy
+        if d < best_d:
+            best_d = d
+            best = i
+    return best
+
+
+if njit is not None:
+    _nearest_index = njit(cache=True, nogil=True)(_nearest_index)
+
+
+def _nearest_safepoint(ux: float, uy: float):
+    """Return the (x, y) of the safepoint closest to (ux, uy) in EPSG:32651."""
+    if safe_points_tree is not None:
+        _, idx = safe_points_tree.query([ux, uy])
+        ex, ey = safe_points_arr[idx]
+        return float(ex), float(ey)
+    if njit is not None and safe_points_arr is not None:
+        # Compiled linear scan when SciPy is not available
+        ex, ey = safe_points_arr[_nearest_index(safe_points_arr, ux, uy)]
+        return float(ex), float(ey)
+    
+    # Linear scan when neither SciPy nor Numba is available
+    dmin = float('inf')
+    ex, ey = None, None
+    for (px, py) in safe_points_utm:
+        d = (px - ux) * (px - ux) + (py - uy) * (py - uy)
+        if d < dmin:
+            dmin = d
+            ex, ey = px, py
+    return ex, ey
+
+
+def _index_segment_positions():
+    """Build the nearest-segment index used by /api/predict.
+
+    Uses x/y columns of segments_data when present, otherwise the spatial
+    index of the road geometries matched to segments_data by HubName.
+    """
+    global segments_xy, segments_rows, segments_tree, segment_lines
+    
+    if {'x', 'y'}.issubset(segments_data.columns):
+        xy = segments_data[['x', 'y']].to_numpy(dtype=np.float64)
+        rows = np.arange(len(segments_data))
+    elif segments_geometries is not None:
+        geoms = segments_geometries
+        if geoms.crs is not None and geoms.crs.to_epsg() != 32651:
+            geoms = geoms.to_crs("EPSG:32651")
+        row_by_hub = pd.Series(np.arange(len(segments_data)), index=segments_data['HubName'])
+        row_by_hub = row_by_hub[~row_by_hub.index.duplicated(keep='first')]
+        rows = geoms['HubName'].map(row_by_hub)
+        valid = (rows.notna() & geoms.geometry.notna() & ~geoms.geometry.is_empty).to_numpy()
+        lines = geoms.geometry[valid].reset_index(drop=True)
+        # Build the R-tree now (it is lazy) so the first request doesn't pay for it
+        lines.sindex
+        segment_lines = lines
+        segments_rows = rows[valid].to_numpy(dtype=np.int64)
+        print(f"Indexed {len(lines)} road geometries for nearest-segment lookup")
+        return
+    else:
+        print("No segment coordinates available; /api/predict will report no data")
+        return
+    
+    segments_xy = xy
+    segments_rows = rows
+    segments_tree = cKDTree(xy) if cKDTree is not None and len(xy) else None
+    print(f"Indexed {len(xy)} segment positions for nearest-segment lookup")
+
+
+def _project_segment_coords(geometries: gpd.GeoDataFrame):
+    """Project every road geometry to WGS84 once into a flat [lat, lng] vertex table.
+
+    Returns (vertices, spans) where spans maps HubName -> (first row, row count).
+    Keeps the first geometry per HubName. Non-line geometries get an empty span
+    and missing ones are left out, so routes fall back to segment endpoints for them.
+    """
+    first = ~geometries['HubName'].duplicated(keep='first') & geometries.geometry.notna()
+    hubs = geometries['HubName'][first].tolist()
+    geoms = geometries.geometry[first].values
+    
+    # Only line geometries contribute vertices (type ids 1 and 5)
+    type_ids = shapely.get_type_id(geoms)
+    geoms = np.where((type_ids == 1) | (type_ids == 5), geoms, None)
+    
+    # Project all vertices with a single transform; get_coordinates keeps them grouped by geometry
+    xy, owner = shapely.get_coordinates(geoms, return_index=True)
+    lngs, lats = _T_INV.transform(xy[:, 0], xy[:, 1])
+    counts = np.bincount(owner, minlength=len(geoms))
+    starts = np.cumsum(counts) - counts
+    return np.column_stack([lats, lngs]), dict(zip(hubs, zip(starts.tolist(), counts.tolist())))
+
+
+def _fill_spans(out, table, dst, src, counts):
+    """Copy table rows [src[k], src[k] + counts[k]) to out rows starting at dst[k], for every span k."""
+    for k in range(dst.shape[0]):
+        d = dst[k]
+        s = src[k]
+        for j in range(counts[k]):
+            out[d + j, 0] = table[s + j, 0]
+            out[d + j, 1] = table[s + j, 1]
+
+
+if njit is not None:
+    _fill_spans = njit(cache=True, nogil=True)(_fill_spans)
+else:
+    def _fill_spans(out, table, dst, src, counts):
+        """Vectorized span copy used when Numba is not available."""
+        def span_rows(starts):
+            offsets = np.cumsum(counts) - counts
+            return np.repeat(starts - offsets, counts) + np.arange(offsets[-1] + counts[-1])
+        out[span_rows(dst)] = table[span_rows(src)]
+
+
+def _build_segments_geojson() -> dict:
+    """Build the /api/segments FeatureCollection from segments_data."""
+    # Read each column once instead of materializing a Series per row
+    ids = segments_data['HubName'].astype(str).tolist()
+    safe = segments_data['pred_safe'].to_numpy(dtype=np.int64).tolist()
+    prob = segments_data['pred_prob_safe'].to_numpy(dtype=np.float64).tolist()
+    
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'properties': {
+                    'id': seg_id,
+                    'safe': seg_safe,
+                    'safety_prob': seg_prob,
+                    'risk_level': 'high' if seg_safe == 0 else 'low'
+                },
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [0, 0]  # Placeholder - would need actual coordinates
+                }
+            }
+            for seg_id, seg_safe, seg_prob in zip(ids, safe, prob)
+        ]
+    }
+
+
+def _nearest_segment_rows(points) -> list:
+    """Return the segments_data row of the segment closest to each (ux, uy).
+
+    Points with no segment within PREDICT_MAX_DISTANCE_M get None.
+    """
+    xy = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    rows = np.full(len(xy), -1, dtype=np.int64)
+    if segment_lines is not None:
+        # Nearest road by true distance to the line, via the R-tree
+        if len(segment_lines):
+            query_idx, tree_idx = segment_lines.sindex.nearest(
+                shapely.points(xy), return_all=False, max_distance=PREDICT_MAX_DISTANCE_M
+            )
+            rows[query_idx] = segments_rows[tree_idx]
+    elif segments_xy is not None and len(segments_xy):
+        if segments_tree is not None:
+            dist, idx = segments_tree.query(xy, distance_upper_bound=PREDICT_MAX_DISTANCE_M)
+        else:
+            idx = np.empty(len(xy), dtype=np.intp)
+            dist = np.empty(len(xy))
+            for i, (ux, uy) in enumerate(xy):
+                d2 = (segments_xy[:, 0] - ux) ** 2 + (segments_xy[:, 1] - uy) ** 2
+                idx[i] = np.argmin(d2)
+                dist[i] = np.sqrt(d2[idx[i]])
+        found = np.flatnonzero(dist <= PREDICT_MAX_DISTANCE_M)
+        rows[found] = segments_rows[idx[found]]
+    return [row if row >= 0 else None for row in rows.tolist()]
+
+
+_segment_batcher = _MicroBatcher(_nearest_segment_rows, PREDICT_BATCH_WINDOW_S, PREDICT_BATCH_MAX)
+
+
+def _nearest_segment_row(ux: float, uy: float):
+    """Return the segments_data row of the segment closest to (ux, uy), or None.
+
+    Concurrent callers are answered together by one batched lookup.
+    """
+    return _segment_batcher((ux, uy))
+
+
+def _load_evacuation_centers(poi_gdf: Optional[gpd.GeoDataFrame]):
+    """Load evacuation centers from POI data as parallel columns and index them for near/bbox queries."""
+    global _centers_lat, _centers_lng, _centers_attrs, centers_index, _centers_grid
+    global _evacuation_centers_bytes, _evacuation_centers_encoded, _evacuation_centers_etag
+    
+    if poi_gdf is None or poi_gdf.empty:
+        _centers_lat, _centers_lng, _centers_attrs, centers_index = np.empty(0), np.empty(0), {}, None
+        _centers_grid = None
+        _evacuation_centers_bytes, _evacuation_centers_encoded, _evacuation_centers_etag = None, {}, None
+        return
+    
+    # Filter for suitable evacuation center types
+    suitable_types = ['school', 'town_hall', 'community_centre', 'hospital', 
+                    'sports_centre', 'stadium', 'university', 'college']
+    
+    if 'fclass' in poi_gdf.columns:
+        poi_gdf = poi_gdf[poi_gdf['fclass'].isin(suitable_types)]
+        print(f"Filtered to {len(poi_gdf)} suitable evacuation centers")
+    
+    # Limit to 500 centers for better coverage across Metro Manila
+    # Use sampling to get better geographic distribution
+    if len(poi_gdf) > 500:
+        poi_gdf = poi_gdf.sample(n=500, random_state=42)
+    else:
+        poi_gdf = poi_gdf.head(500)
+    
+    # Ensure POI data is in WGS84 for the frontend
+    if poi_gdf.crs is None:
+        poi_gdf = poi_gdf.set_crs("EPSG:4326", allow_override=True)
+    elif poi_gdf.crs.to_string() != "EPSG:4326":
+        poi_gdf = poi_gdf.to_crs("EPSG:4326")
+    
+    # Keep points and polygons; a point's centroid is the point itself
+    poi_gdf = poi_gdf[poi_gdf.geom_type.isin(['Point', 'Polygon', 'MultiPolygon'])]
+    centroids = shapely.centroid(poi_gdf.geometry.values)
+    ids = poi_gdf.index.astype(str).tolist()
+    
+    def column_or(name, default):
+        if name in poi_gdf.columns:
+            return poi_gdf[name].tolist()
+        return default if isinstance(default, list) else [default] * len(poi_gdf)
+    
+    # Coordinates stay as float64 arrays so queries can mask them directly
+    _centers_lat = shapely.get_y(centroids)
+    _centers_lng = shapely.get_x(centroids)
+    _centers_attrs = {
+        'id': ids,
+        'name': column_or('name', [f'Evacuation Center {i}' for i in ids]),
+        'capacity': column_or('capacity', 500),
+        'safety_score': column_or('safety_score', 0.8)
+    }
+    
+    # The unfiltered payload never changes after startup, so serialize it once
+    _evacuation_centers_bytes = _dumps(_center_records(range(len(ids)))) if ids else None
+    # Compress it once too, at the highest levels since this only runs at startup
+    _evacuation_centers_encoded = {}
+    _evacuation_centers_etag = None
+    if _evacuation_centers_bytes is not None:
+        _evacuation_centers_etag = hashlib.sha1(_evacuation_centers_bytes).hexdigest()
+        if brotli is not None:
+            _evacuation_centers_encoded['br'] = brotli.compress(_evacuation_centers_bytes, quality=11)
+        _evacuation_centers_encoded['gzip'] = gzip.compress(_evacuation_centers_bytes, compresslevel=9, mtime=0)
+    centers_index, _centers_grid = None, None
+    if rtree_index is not None and len(ids) > CENTERS_GRID_MAX_N:
+        # Bulk-load the tree from a stream, which packs it better than inserting one by one
+        centers_index = rtree_index.Index(
+            (i, (lng, lat, lng, lat), None)
+            for i, (lng, lat) in enumerate(zip(_centers_lng.tolist(), _centers_lat.tolist()))
+        )
+    else:
+        # For small N a dict of cells has far less per-query overhead than libspatialindex
+        _centers_grid = defaultdict(list)
+        cells = zip(
+            np.floor(_centers_lat / CENTERS_GRID_CELL_DEG).astype(np.int64).tolist(),
+            np.floor(_centers_lng / CENTERS_GRID_CELL_DEG).astype(np.int64).tolist()
+        )
+        for i, cell in enumerate(cells):
+            _centers_grid[cell].append(i)
+        _centers_grid = dict(_centers_grid)
+    if njit is not None:
+        # Compile (or load from cache) the nearest-center kernel before the first request
+        _haversine_km(_centers_lat, _centers_lng, 0.0, 0.0, np.empty(len(ids)))
+    print(f"Evacuation centers loaded: {len(ids)}")
+
+
+def _center_records(rows) -> list:
+    """Center dicts in the /api/evacuation-centers shape for the given positions."""
+    rows = list(rows)
+    ids, names = _centers_attrs['id'], _centers_attrs['name']
+    capacities, scores = _centers_attrs['capacity'], _centers_attrs['safety_score']
+    return [
+        {
+            'id': ids[i],
+            'name': names[i],
+            'latitude': lat,
+            'longitude': lng,
+            'capacity': capacities[i],
+            'safety_score': scores[i]
+        }
+        for i, lat, lng in zip(rows, _centers_lat[rows].tolist(), _centers_lng[rows].tolist())
+    ]
+
+
+def _haversine_km(lat, lng, lat0, lng0, out):
+    """Write the great-circle distance in km from (lat0, lng0) to every (lat[i], lng[i]) into out."""
+    rad = np.pi / 180.0
+    cos0 = np.cos(lat0 * rad)
+    for i in range(lat.shape[0]):
+        sin_dlat = np.sin((lat[i] - lat0) * rad * 0.5)
+        sin_dlng = np.sin((lng[i] - lng0) * rad * 0.5)
+        a = sin_dlat * sin_dlat + cos0 * np.cos(lat[i] * rad) * sin_dlng * sin_dlng
+        out[i] = 2.0 * 6371.0088 * np.arcsin(np.sqrt(min(a, 1.0)))
+
+
+if njit is not None:
+    _haversine_km = njit(cache=True, nogil=True, fastmath=True)(_haversine_km)
+else:
+    def _haversine_km(lat, lng, lat0, lng0, out):
+        """Vectorized haversine used when Numba is not available."""
+        rad = np.pi / 180.0
+        a = (
+            np.sin((lat - lat0) * rad * 0.5) ** 2
+            + np.cos(lat0 * rad) * np.cos(lat * rad) * np.sin((lng - lng0) * rad * 0.5) ** 2
+        )
+        out[:] = 2.0 * 6371.0088 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _nearest_centers(lat: float, lng: float, k: int) -> list:
+    """Positions of the k centers closest to (lat, lng) by great-circle distance, nearest first."""
+    distances = np.empty(len(_centers_lat))
+    _haversine_km(_centers_lat, _centers_lng, lat, lng, distances)
+    return np.argsort(distances, kind='stable')[:k].tolist()
+
+
+def _centers_in_bbox(min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> list:
+    """Positions of the centers inside the bounding box, in list order."""
+    if min_lng > max_lng or min_lat > max_lat:
+        return []
+    if centers_index is not None:
+        return sorted(centers_index.intersection((min_lng, min_lat, max_lng, max_lat)))
+    
+    # Gather the grid cells overlapping the box; for a box wider than the data, scan the occupied cells
+    row_lo, row_hi = int(np.floor(min_lat / CENTERS_GRID_CELL_DEG)), int(np.floor(max_lat / CENTERS_GRID_CELL_DEG))
+    col_lo, col_hi = int(np.floor(min_lng / CENTERS_GRID_CELL_DEG)), int(np.floor(max_lng / CENTERS_GRID_CELL_DEG))
+    if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) <= len(_centers_grid):
+        cells = [(r, c) for r in range(row_lo, row_hi + 1) for c in range(col_lo, col_hi + 1)]
+    else:
+        cells = [cell for cell in _centers_grid if row_lo <= cell[0] <= row_hi and col_lo <= cell[1] <= col_hi]
+    candidates = np.array(
+        sorted(i for cell in cells for i in _centers_grid.get(cell, ())), dtype=np.int64
+    )
+    
+    # Edge cells stick out of the box, so filter the candidates exactly
+    lat, lng = _centers_lat[candidates], _centers_lng[candidates]
+    inside = (lng >= min_lng) & (lng <= max_lng) & (lat >= min_lat) & (lat <= max_lat)
+    return candidates[inside].tolist()
+
+
 def initialize_ml_models():
     """Initialize ML models and data"""
     global ml_inference, router, segments_data, segments_geometries
     
     print("Initializing ML models...")
+    _cached_route_json.cache_clear()
     
     try:
         # Resolve project directories
@@ -113,7 +619,7 @@ def initialize_ml_models():
         data_dir = project_root / "data"
         models_dir = project_root / "models"
         
-        # Load ML inference engine
+        # Load ML inference engine; under preload_app the workers share it copy-on-write
         ml_inference = FloodRiskInference(
             model_path=str(models_dir / "rf_model_balanced.joblib"),
             scaler_path=str(models_dir / "scaler.joblib")
@@ -130,18 +636,28 @@ def initialize_ml_models():
         print("Router initialized successfully")
         
         # Load segments data for quick lookup
-        segments_data = pd.read_csv(data_dir / 'segments_safe_min_dedup.csv')
-        segments_data['HubName'] = segments_data['HubName'].astype(str)
+        # Parse HubName straight to str and the 0/1 label as int8
+        segments_data = pd.read_csv(
+            data_dir / 'segments_safe_min_dedup.csv',
+            dtype={'HubName': str, 'pred_safe': 'int8', 'pred_prob_safe': 'float64'}
+        )
         print(f"Segments data loaded: {len(segments_data)} segments")
+        globals()["_segments_geojson_bytes"] = _dumps(_build_segments_geojson())
         
         # Load road geometries from GeoJSON
         try:
             segments_geometries = gpd.read_file(data_dir / 'segments_safe_min_dedup.geojson')
             segments_geometries['HubName'] = segments_geometries['HubName'].astype(str)
+            globals()["_seg_vertices"], globals()["_seg_span_by_hub"] = _project_segment_coords(segments_geometries)
+            if njit is not None:
+                # Compile the span copy now so the first route doesn't pay for it
+                _fill_spans(np.empty((0, 2)), _seg_vertices, *(np.zeros(0, dtype=np.int64),) * 3)
             print(f"Road geometries loaded: {len(segments_geometries)} segments with actual road shapes")
         except Exception as e:
             print(f"Warning: Could not load road geometries: {e}")
             segments_geometries = None
+        
+        _index_segment_positions()
 
         # Load safepoints and project to EPSG:32651 (UTM Zone 51N)
         sp_gdf = _read_safepoints_anywhere()
@@ -161,8 +677,14 @@ def initialize_ml_models():
                 
                 if coords:
                     print(f"Safepoints loaded: {len(coords)} points")
-                    # Store as list for fast nearest lookup
+                    # Store as list plus a KD-tree for fast nearest lookup
                     globals()["safe_points_utm"] = coords
+                    globals()["safe_points_arr"] = np.asarray(coords, dtype=np.float64)
+                    if cKDTree is not None:
+                        globals()["safe_points_tree"] = cKDTree(safe_points_arr)
+                    elif njit is not None:
+                        # Compile the scan now so the first request doesn't pay for it
+                        _nearest_index(safe_points_arr, 0.0, 0.0)
                 else:
                     print("Safepoints file has no valid geometries; skipping safepoints integration")
             except Exception as e:
@@ -170,12 +692,171 @@ def initialize_ml_models():
         else:
             print("No safepoints file found. You can set SAFEPOINTS_PATH or place safepoints.gpkg/shp/geojson/csv in the project root.")
         
+        # Evacuation centers come from the same POI data
+        try:
+            _load_evacuation_centers(sp_gdf)
+        except Exception as e:
+            print(f"Warning: Could not load evacuation centers: {e}")
+        
         return True
         
     except Exception as e:
         print(f"Error initializing ML models: {e}")
         return False
 
+
+@lru_cache(maxsize=None)
+def _parse_xy(node: str) -> tuple:
+    """Parse a router node name "x,y" into floats; names come from the finite graph node set."""
+    x, y = node.split(',')
+    return float(x), float(y)
+
+
+def _build_route_response(route: dict, cost_function: str) -> dict:
+    """Turn a successful router result into the route JSON sent to the frontend."""
+    # Debug output is formatted lazily, so it costs nothing unless debug logging is on
+    app.logger.debug("Route found with %d nodes", len(route.get('path', [])))
+    app.logger.debug("Segments geometries available: %s", segments_geometries is not None)
+    app.logger.debug("Path details available: %s", 'path_details' in route)
+    if 'path_details' in route:
+        app.logger.debug("Number of segments in path: %d", len(route['path_details'].get('segments', [])))
+    
+    # Extract actual road geometries from segments for curved paths
+    route_coords = []
+    
+    if segments_geometries is not None and 'path_details' in route and 'segments' in route['path_details']:
+        # Use actual road geometries for accurate visualization
+        # The loop only reads the segments, so iterate them in place
+        segments_list = route['path_details']['segments']
+        app.logger.debug("Extracting geometries for %d segments", len(segments_list))
+        
+        # Road vertices are already in [lat, lng]; only endpoint fallbacks need projecting.
+        # Record where each segment lands so one kernel call fills the output.
+        span_dst, span_src, span_counts = [], [], []  # Output row, _seg_vertices row, row count
+        fallback_xy = []
+        fallback_rows = []
+        total = 0
+        for idx, segment in enumerate(segments_list):
+            try:
+                segment_id = str(segment.get('segment_id', ''))
+                if not segment_id:
+                    continue
+                    
+                # Find pre-projected geometry for this segment
+                span = _seg_span_by_hub.get(segment_id)
+                
+                if span is not None:
+                    start, count = span
+                    if count:
+                        span_dst.append(total)
+                        span_src.append(start)
+                        span_counts.append(count)
+                        total += count
+                else:
+                    # Fallback: use segment endpoints if geometry not found
+                    from_node = segment.get('from', '')
+                    to_node = segment.get('to', '')
+                    if from_node and to_node:
+                        try:
+                            fallback_xy.extend((_parse_xy(from_node), _parse_xy(to_node)))
+                            fallback_rows.extend((total, total + 1))
+                            total += 2
+                        except Exception as fallback_err:
+                            app.logger.debug("Fallback error for segment %s: %s", segment_id, fallback_err)
+            except Exception as e:
+                app.logger.debug("Error processing segment %d: %s", idx, e, exc_info=True)
+        
+        if total:
+            out = np.empty((total, 2))
+            if span_counts:
+                _fill_spans(
+                    out, _seg_vertices,
+                    np.asarray(span_dst, dtype=np.int64),
+                    np.asarray(span_src, dtype=np.int64),
+                    np.asarray(span_counts, dtype=np.int64)
+                )
+            if fallback_xy:
+                xy = np.asarray(fallback_xy)
+                lngs, lats = _T_INV.transform(xy[:, 0], xy[:, 1])
+                out[fallback_rows, 0] = lats
+                out[fallback_rows, 1] = lngs
+            route_coords = out.tolist()
+        app.logger.debug("Extracted %d coordinate points", len(route_coords))
+    else:
+        # Fallback: use node coordinates if geometries not available,
+        # streamed through PROJ without building intermediate arrays
+        def node_xy():
+            for node in route['path']:
+                try:
+                    yield _parse_xy(node)
+                except Exception as e:
+                    app.logger.debug("Error converting %s: %s", node, e)
+        
+        route_coords = [[lat, lng] for lng, lat in _T_INV.itransform(node_xy())]
+    
+    # Generate turn-by-turn directions
+    directions = []
+    directions_summary = {}
+    if route_coords and len(route_coords) >= 2:
+        try:
+            directions = generate_turn_by_turn_directions(route_coords)
+            directions_summary = get_direction_summary(directions)
+            app.logger.debug("Generated %d turn-by-turn directions", len(directions))
+        except Exception as e:
+            app.logger.warning("Error generating directions: %s", e)
+    
+    # Format response for frontend
+    route_response = {
+        'route': route_coords,  # Now in [[lat, lng], [lat, lng], ...] format with curves
+        'totalDistance': route['total_distance'] / 1000,  # Convert meters to km
+        'safetyScore': route['avg_safety'],
+        'floodRisk': 1.0 - route['avg_safety'],  # Convert safety to risk
+        'numSegments': route['num_segments'],
+        'costFunction': cost_function,
+        'segments': route['path_details']['segments'] if 'path_details' in route else [],
+        'directions': directions,  # Turn-by-turn navigation
+        'directionsSummary': directions_summary  # Route summary
+    }
+    
+    return route_response
+
+
+class _RouteNotFound(Exception):
+    """Raised by _cached_route_json when the router finds no route; the message is the router's."""
+
+
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def _cached_route_json(sx_cell: int, sy_cell: int, ex_cell: int, ey_cell: int, cost_function: str):
+    """Route between the centers of two grid cells and return the JSON body.
+
+    Failures raise _RouteNotFound, so only successful routes are cached.
+    """
+    start_coords = f"{sx_cell * ROUTE_CACHE_GRID_M},{sy_cell * ROUTE_CACHE_GRID_M}"
+    end_coords = f"{ex_cell * ROUTE_CACHE_GRID_M},{ey_cell * ROUTE_CACHE_GRID_M}"
+    
+    # Calculate route off the request thread
+    route = _route_pool.submit(router.find_optimal_route, start_coords, end_coords, cost_function).result()
+    if not route['success']:
+        raise _RouteNotFound(route['message'])
+    
+    return _dumps(_build_route_response(route, cost_function))
+
+
+def _route_json_response(sx: float, sy: float, ex: float, ey: float, cost_function: str):
+    """Serve the route between two UTM points, snapped to the cache grid."""
+    if not isinstance(cost_function, str) or cost_function not in COST_FUNCTIONS:
+        return jsonify({'error': f"cost_function must be one of: {', '.join(COST_FUNCTIONS)}"}), 400
+    try:
+        body = _cached_route_json(
+            round(sx / ROUTE_CACHE_GRID_M), round(sy / ROUTE_CACHE_GRID_M),
+            round(ex / ROUTE_CACHE_GRID_M), round(ey / ROUTE_CACHE_GRID_M),
+            cost_function
+        )
+    except _RouteNotFound as e:
+        return jsonify({'error': str(e)}), 400
+    return app.response_class(body, mimetype='application/json')
+
+
 @app.route('/')
 def home():
     """API home endpoint"""
@@ -207,32 +888,11 @@ def health():
 def get_segments():
     """Get all road segments with safety predictions"""
     try:
-        if segments_data is None:
+        if _segments_geojson_bytes is None:
             return jsonify({'error': 'Segments data not loaded'}), 500
         
-        # Convert to GeoJSON format for frontend
-        segments_geojson = {
-            'type': 'FeatureCollection',
-            'features': []
-        }
-        
-        for _, segment in segments_data.iterrows():
-            feature = {
-                'type': 'Feature',
-                'properties': {
-                    'id': segment['HubName'],
-                    'safe': int(segment['pred_safe']),
-                    'safety_prob': float(segment['pred_prob_safe']),
-                    'risk_level': 'high' if segment['pred_safe'] == 0 else 'low'
-                },
-                'geometry': {
-                    'type': 'Point',
-                    'coordinates': [0, 0]  # Placeholder - would need actual coordinates
-                }
-            }
-            segments_geojson['features'].append(feature)
-        
-        return jsonify(segments_geojson)
+        # The payload only depends on segments_data, so it is serialized once at startup
+        return app.response_class(_segments_geojson_bytes, mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -250,15 +910,11 @@ def predict_flood_risk_api():
         lng = float(data['longitude'])
         
         # Convert to UTM coordinates using proper projection
-        from pyproj import Transformer
-        transformer = Transformer.from_crs("EPSG:4326", "EPSG:32651", always_xy=True)
-        utm_x, utm_y = transformer.transform(lng, lat)
+        utm_x, utm_y = _T_FWD.transform(lng, lat)
         
         # Find nearest segment
-        if segments_data is not None:
-            # Simple distance calculation to find nearest segment
-            distances = np.sqrt((segments_data.get('x', 0) - utm_x)**2 + (segments_data.get('y', 0) - utm_y)**2)
-            nearest_idx = distances.idxmin()
+        nearest_idx = _nearest_segment_row(utm_x, utm_y) if segments_data is not None else None
+        if nearest_idx is not None:
             nearest_segment = segments_data.iloc[nearest_idx]
             
             prediction = {
@@ -268,12 +924,12 @@ def predict_flood_risk_api():
                 'segment_id': nearest_segment['HubName']
             }
         else:
-            # Fallback prediction
+            # No segment data here (or none within PREDICT_MAX_DISTANCE_M): say so rather than guess "low"
             prediction = {
-                'safe': 1,
-                'safety_probability': 0.8,
-                'risk_level': 'low',
-                'segment_id': 'unknown'
+                'safe': None,
+                'safety_probability': None,
+                'risk_level': 'unknown',
+                'segment_id': None
             }
         
         return jsonify(prediction)
@@ -301,151 +957,29 @@ def calculate_route():
         if 'latitude' not in start or 'longitude' not in start:
             return jsonify({'error': 'Start coordinates must include latitude and longitude'}), 400
         
-        # Convert coordinates to UTM-approx strings expected by router (x,y)
-        def latlng_to_utm_xy(lat_val: float, lng_val: float) -> str:
+        # Convert coordinates to UTM (x, y) expected by router
+        def latlng_to_utm_xy(lat_val: float, lng_val: float) -> tuple:
             try:
                 # Use proper UTM conversion for Philippines (Zone 51N)
-                from pyproj import Transformer
-                transformer = Transformer.from_crs("EPSG:4326", "EPSG:32651", always_xy=True)
-                ux, uy = transformer.transform(lng_val, lat_val)
-                return f"{ux},{uy}"
+                return _T_FWD.transform(lng_val, lat_val)
             except Exception as e:
                 raise ValueError(f"Invalid coordinates: {e}")
 
-        start_coords = latlng_to_utm_xy(float(start['latitude']), float(start['longitude']))
+        sx, sy = latlng_to_utm_xy(float(start['latitude']), float(start['longitude']))
 
         if end is not None and 'latitude' in end and 'longitude' in end:
-            end_coords = latlng_to_utm_xy(float(end['latitude']), float(end['longitude']))
+            ex, ey = latlng_to_utm_xy(float(end['latitude']), float(end['longitude']))
         else:
             # If end is not supplied, use nearest safepoint to the user
             if safe_points_utm:
-                sx, sy = map(float, start_coords.split(','))
                 # Find nearest safepoint by Euclidean distance in UTM
-                dmin = float('inf')
-                ex, ey = None, None
-                for (px, py) in safe_points_utm:
-                    d = (px - sx) * (px - sx) + (py - sy) * (py - sy)
-                    if d < dmin:
-                        dmin = d
-                        ex, ey = px, py
-                if ex is not None and ey is not None:
-                    end_coords = f"{ex},{ey}"
-                else:
+                ex, ey = _nearest_safepoint(sx, sy)
+                if ex is None or ey is None:
                     return jsonify({'error': 'No valid safepoints available'}), 500
             else:
                 return jsonify({'error': 'No safepoints configured. Provide "end" or configure safepoints.'}), 400
         
-        # Calculate route
-        route = router.find_optimal_route(start_coords, end_coords, cost_function)
-        
-        if not route['success']:
-            return jsonify({'error': route['message']}), 400
-        
-        print(f"Route found with {len(route.get('path', []))} nodes")
-        print(f"Segments geometries available: {segments_geometries is not None}")
-        print(f"Path details available: {'path_details' in route}")
-        if 'path_details' in route:
-            print(f"Number of segments in path: {len(route['path_details'].get('segments', []))}")
-        
-        # Extract actual road geometries from segments for curved paths
-        route_coords = []
-        
-        if segments_geometries is not None and 'path_details' in route and 'segments' in route['path_details']:
-            # Use actual road geometries for accurate visualization
-            from pyproj import Transformer
-            transformer = Transformer.from_crs("EPSG:32651", "EPSG:4326", always_xy=True)
-            
-            # Create a deep copy to avoid iteration issues
-            import copy
-            segments_list = copy.deepcopy(route['path_details']['segments'])
-            print(f"Extracting geometries for {len(segments_list)} segments")
-            
-            for idx, segment in enumerate(segments_list):
-                try:
-                    segment_id = str(segment.get('segment_id', ''))
-                    if not segment_id:
-                        continue
-                        
-                    # Find geometry for this segment
-                    matching_geoms = segments_geometries[segments_geometries['HubName'] == segment_id]
-                    
-                    if len(matching_geoms) > 0:
-                        geom = matching_geoms.iloc[0].geometry
-                        # Extract coordinates from the geometry
-                        if geom.geom_type == 'MultiLineString':
-                            for line in geom.geoms:
-                                coords_list = list(line.coords)
-                                for coord in coords_list:
-                                    lng, lat = transformer.transform(coord[0], coord[1])
-                                    route_coords.append([lat, lng])
-                        elif geom.geom_type == 'LineString':
-                            coords_list = list(geom.coords)
-                            for coord in coords_list:
-                                lng, lat = transformer.transform(coord[0], coord[1])
-                                route_coords.append([lat, lng])
-                    else:
-                        # Fallback: use segment endpoints if geometry not found
-                        from_node = segment.get('from', '')
-                        to_node = segment.get('to', '')
-                        if from_node and to_node:
-                            try:
-                                fx, fy = map(float, from_node.split(','))
-                                tx, ty = map(float, to_node.split(','))
-                                lng1, lat1 = transformer.transform(fx, fy)
-                                lng2, lat2 = transformer.transform(tx, ty)
-                                route_coords.append([lat1, lng1])
-                                route_coords.append([lat2, lng2])
-                            except Exception as fallback_err:
-                                print(f"Fallback error for segment {segment_id}: {fallback_err}")
-                except Exception as e:
-                    print(f"Error processing segment {idx}: {e}")
-                    import traceback
-                    traceback.print_exc()
-            
-            print(f"Extracted {len(route_coords)} coordinate points")
-        else:
-            # Fallback: use node coordinates if geometries not available
-            def utm_xy_to_latlng(utm_str: str) -> list:
-                try:
-                    ux, uy = map(float, utm_str.split(','))
-                    from pyproj import Transformer
-                    transformer = Transformer.from_crs("EPSG:32651", "EPSG:4326", always_xy=True)
-                    lng, lat = transformer.transform(ux, uy)
-                    return [lat, lng]
-                except Exception as e:
-                    print(f"Error converting {utm_str}: {e}")
-                    return None
-            
-            for node in route['path']:
-                coords = utm_xy_to_latlng(node)
-                if coords:
-                    route_coords.append(coords)
-        
-        # Generate turn-by-turn directions
-        directions = []
-        directions_summary = {}
-        if route_coords and len(route_coords) >= 2:
-            try:
-                directions = generate_turn_by_turn_directions(route_coords)
-                directions_summary = get_direction_summary(directions)
-                print(f"Generated {len(directions)} turn-by-turn directions")
-            except Exception as e:
-                print(f"Error generating directions: {e}")
-        
-        # Format response for frontend
-        route_response = {
-            'route': route_coords,  # Now in [[lat, lng], [lat, lng], ...] format with curves
-            'totalDistance': route['total_distance'] / 1000,  # Convert meters to km
-            'safetyScore': route['avg_safety'],
-            'floodRisk': 1.0 - route['avg_safety'],  # Convert safety to risk
-            'numSegments': route['num_segments'],
-            'costFunction': cost_function,
-            'segments': route['path_details']['segments'] if 'path_details' in route else [],
-            'directions': directions,  # Turn-by-turn navigation
-            'directionsSummary': directions_summary  # Route summary
-        }
-        
-        return jsonify(route_response)
+        return _route_json_response(sx, sy, ex, ey, cost_function)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -469,183 +1003,69 @@ def nearest_safe_route():
         cost_function = data.get('cost_function', 'combined')
 
         # Convert to UTM using proper projection
-        from pyproj import Transformer
-        transformer = Transformer.from_crs("EPSG:4326", "EPSG:32651", always_xy=True)
-        ux, uy = transformer.transform(lng, lat)
-        start_coords = f"{ux},{uy}"
+        ux, uy = _T_FWD.transform(lng, lat)
 
         if not safe_points_utm:
             return jsonify({'error': 'No safepoints configured. Set SAFEPOINTS_PATH or place a safepoints file in the project root.'}), 500
 
         # Find nearest safepoint
-        dmin = float('inf')
-        ex, ey = None, None
-        for (px, py) in safe_points_utm:
-            d = (px - ux) * (px - ux) + (py - uy) * (py - uy)
-            if d < dmin:
-                dmin = d
-                ex, ey = px, py
-        end_coords = f"{ex},{ey}"
-
-        # Calculate route
-        route = router.find_optimal_route(start_coords, end_coords, cost_function)
-        if not route['success']:
-            return jsonify({'error': route['message']}), 400
-
-        # Extract actual road geometries from segments for curved paths
-        route_coords = []
-        
-        if segments_geometries is not None and 'path_details' in route and 'segments' in route['path_details']:
-            # Use actual road geometries for accurate visualization
-            from pyproj import Transformer
-            transformer = Transformer.from_crs("EPSG:32651", "EPSG:4326", always_xy=True)
-            
-            # Create a deep copy to avoid iteration issues
-            import copy
-            segments_list = copy.deepcopy(route['path_details']['segments'])
-            
-            for idx, segment in enumerate(segments_list):
-                try:
-                    segment_id = str(segment.get('segment_id', ''))
-                    if not segment_id:
-                        continue
-                        
-                    # Find geometry for this segment
-                    matching_geoms = segments_geometries[segments_geometries['HubName'] == segment_id]
-                    
-                    if len(matching_geoms) > 0:
-                        geom = matching_geoms.iloc[0].geometry
-                        # Extract coordinates from the geometry
-                        if geom.geom_type == 'MultiLineString':
-                            for line in geom.geoms:
-                                coords_list = list(line.coords)
-                                for coord in coords_list:
-                                    lng, lat = transformer.transform(coord[0], coord[1])
-                                    route_coords.append([lat, lng])
-                        elif geom.geom_type == 'LineString':
-                            coords_list = list(geom.coords)
-                            for coord in coords_list:
-                                lng, lat = transformer.transform(coord[0], coord[1])
-                                route_coords.append([lat, lng])
-                    else:
-                        # Fallback: use segment endpoints if geometry not found
-                        from_node = segment.get('from', '')
-                        to_node = segment.get('to', '')
-                        if from_node and to_node:
-                            try:
-                                fx, fy = map(float, from_node.split(','))
-                                tx, ty = map(float, to_node.split(','))
-                                lng1, lat1 = transformer.transform(fx, fy)
-                                lng2, lat2 = transformer.transform(tx, ty)
-                                route_coords.append([lat1, lng1])
-                                route_coords.append([lat2, lng2])
-                            except Exception as fallback_err:
-                                print(f"Fallback error for segment {segment_id}: {fallback_err}")
-                except Exception as e:
-                    print(f"Error processing segment {idx}: {e}")
-                    import traceback
-                    traceback.print_exc()
-        else:
-            # Fallback: use node coordinates if geometries not available
-            def utm_xy_to_latlng(utm_str: str) -> list:
-                try:
-                    ux, uy = map(float, utm_str.split(','))
-                    from pyproj import Transformer
-                    transformer = Transformer.from_crs("EPSG:32651", "EPSG:4326", always_xy=True)
-                    lng, lat = transformer.transform(ux, uy)
-                    return [lat, lng]
-                except Exception as e:
-                    print(f"Error converting {utm_str}: {e}")
-                    return None
-            
-            for node in route['path']:
-                coords = utm_xy_to_latlng(node)
-                if coords:
-                    route_coords.append(coords)
+        ex, ey = _nearest_safepoint(ux, uy)
 
-        # Generate turn-by-turn directions
-        directions = []
-        directions_summary = {}
-        if route_coords and len(route_coords) >= 2:
-            try:
-                directions = generate_turn_by_turn_directions(route_coords)
-                directions_summary = get_direction_summary(directions)
-                print(f"Generated {len(directions)} turn-by-turn directions")
-            except Exception as e:
-                print(f"Error generating directions: {e}")
-
-        route_response = {
-            'route': route_coords,  # Now in [[lat, lng], [lat, lng], ...] format with curves
-            'totalDistance': route['total_distance'] / 1000,  # Convert meters to km
-            'safetyScore': route['avg_safety'],
-            'floodRisk': 1.0 - route['avg_safety'],
-            'numSegments': route['num_segments'],
-            'costFunction': cost_function,
-            'segments': route['path_details']['segments'] if 'path_details' in route else [],
-            'directions': directions,  # Turn-by-turn navigation
-            'directionsSummary': directions_summary  # Route summary
-        }
-        return jsonify(route_response)
+        return _route_json_response(ux, uy, ex, ey, cost_function)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/evacuation-centers')
 def get_evacuation_centers():
-    """Get evacuation centers data from POI files"""
+    """Get evacuation centers data from POI files
+
+    Optional query parameters:
+    - near=<lat>,<lng> and k=<count>: the k (default 5) centers closest to a point
+    - bbox=<min_lng>,<min_lat>,<max_lng>,<max_lat>: the centers inside a bounding box
+    """
     try:
-        # Load POI data as evacuation centers
-        poi_gdf = _read_safepoints_anywhere()
-        if poi_gdf is not None and not poi_gdf.empty:
-            # Filter for suitable evacuation center types
-            suitable_types = ['school', 'town_hall', 'community_centre', 'hospital', 
-                            'sports_centre', 'stadium', 'university', 'college']
-            
-            if 'fclass' in poi_gdf.columns:
-                poi_gdf = poi_gdf[poi_gdf['fclass'].isin(suitable_types)]
-                print(f"Filtered to {len(poi_gdf)} suitable evacuation centers")
+        if _evacuation_centers_bytes is None:
+            # Return empty list if no POI data available
+            return jsonify([])
+        
+        near = request.args.get('near')
+        bbox = request.args.get('bbox')
+        if near is None and bbox is None:
+            # Pick the best precompressed body the client accepts
+            body, encoding = _evacuation_centers_bytes, None
+            for name, compressed in _evacuation_centers_encoded.items():
+                if request.accept_encodings[name] > 0:
+                    body, encoding = compressed, name
+                    break
+            # Each encoding is its own representation, so it gets its own tag
+            etag = _evacuation_centers_etag if encoding is None else f"{_evacuation_centers_etag}-{encoding}"
             
-            # Limit to 500 centers for better coverage across Metro Manila
-            # Use sampling to get better geographic distribution
-            if len(poi_gdf) > 500:
-                poi_gdf = poi_gdf.sample(n=500, random_state=42)
+            if request.if_none_match.contains_weak(etag):
+                # The client's copy is current; send headers only
+                response = app.response_class(status=304)
             else:
-                poi_gdf = poi_gdf.head(500)
-            
-            centers = []
-            # Ensure POI data is in WGS84 for the frontend
-            if poi_gdf.crs is None:
-                poi_gdf = poi_gdf.set_crs("EPSG:4326", allow_override=True)
-            elif poi_gdf.crs.to_string() != "EPSG:4326":
-                poi_gdf = poi_gdf.to_crs("EPSG:4326")
-            
-            for idx, row in poi_gdf.iterrows():
-                # Convert to lat/lng for frontend
-                geom = row.geometry
-                if geom is not None:
-                    # Handle both points and polygons
-                    if geom.geom_type == 'Point':
-                        lng, lat = geom.x, geom.y
-                    elif geom.geom_type in ['Polygon', 'MultiPolygon']:
-                        centroid = geom.centroid
-                        lng, lat = centroid.x, centroid.y
-                    else:
-                        continue
-                    
-                    center = {
-                        'id': str(idx),
-                        'name': row.get('name', f'Evacuation Center {idx}'),
-                        'latitude': lat,
-                        'longitude': lng,
-                        'capacity': row.get('capacity', 500),
-                        'safety_score': row.get('safety_score', 0.8)
-                    }
-                    centers.append(center)
-            
-            if centers:
-                return jsonify(centers)
+                # Hand the prebuilt buffer to the WSGI server as-is, with an explicit length
+                response = app.response_class(body, mimetype='application/json', direct_passthrough=True)
+                if encoding is not None:
+                    response.headers['Content-Encoding'] = encoding
+                response.headers['Content-Length'] = str(len(body))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'public, max-age=300'
+            response.vary.add('Accept-Encoding')
+            return response
         
-        # Return empty list if no POI data available
-        return jsonify([])
+        try:
+            if near is not None:
+                lat, lng = map(float, near.split(','))
+                k = max(1, int(request.args.get('k', 5)))
+                rows = _nearest_centers(lat, lng, k)
+            else:
+                min_lng, min_lat, max_lng, max_lat = map(float, bbox.split(','))
+                rows = _centers_in_bbox(min_lng, min_lat, max_lng, max_lat)
+        except ValueError:
+            return jsonify({'error': 'Expected near=<lat>,<lng> or bbox=<min_lng>,<min_lat>,<max_lng>,<max_lat>'}), 400
+        
+        return fast_jsonify(_center_records(rows))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -717,8 +1137,9 @@ if __name__ == '__main__':
         print("API available at: http://localhost:5000")
         print("Frontend should connect to: http://localhost:5000")
         
-        # Start Flask server
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        # Start Flask server; the debugger and reloader are opt-in via SHELTR_DEBUG=1
+        debug = os.getenv("SHELTR_DEBUG") == "1"
+        app.run(host='0.0.0.0', port=5000, debug=debug, use_reloader=debug)
     else:
         print("Failed to initialize ML models")
         print("Please check that all required files are present:")
@@ -1,30 +1,101 @@
+import atexit
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import json
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    import orjson
+except ImportError:
+    # Fall back to requests' built-in JSON decoding
+    orjson = None
+
+BASE_URL = 'http://127.0.0.1:5000'
+
+# GET endpoints smoke-tested on each run
+PROBE_PATHS = [
+    '/api/health',
+    '/api/evacuation-centers',
+    '/api/segments',
+    '/api/flood-risk',
+    '/api/weather',
+    '/api/notifications',
+]
+
+# One keep-alive connection pool shared by every endpoint probe
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=50,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+atexit.register(SESSION.close)
+
+
+def check_endpoint(path):
+    """GET an API endpoint over the shared session"""
+    return SESSION.get(BASE_URL + path)
+
+
+def probe(path):
+    """GET one endpoint, returning the response or the exception it raised"""
+    try:
+        return check_endpoint(path)
+    except Exception as e:
+        return e
+
+
+def parse_json(response):
+    """Decode a JSON response body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+# Probe every endpoint concurrently; the run takes as long as the slowest one
+with ThreadPoolExecutor(max_workers=8) as executor:
+    results = dict(zip(PROBE_PATHS, executor.map(probe, PROBE_PATHS)))
 
 # Test evacuation centers endpoint
 print("Testing /api/evacuation-centers endpoint...")
 try:
-    response = requests.get('http://127.0.0.1:5000/api/evacuation-centers')
+    response = results['/api/evacuation-centers']
+    if isinstance(response, Exception):
+        raise response
     print(f"Status Code: {response.status_code}")
     
     if response.status_code == 200:
-        centers = response.json()
+        centers = parse_json(response)
         print(f"\nTotal evacuation centers returned: {len(centers)}")
         
         if centers:
+            # One pass over the payload; the preview and the stats both read this table
+            table = np.array(
+                [(c['name'], c['latitude'], c['longitude']) for c in centers],
+                dtype=[('name', object), ('latitude', np.float64), ('longitude', np.float64)]
+            )
+            
             print(f"\nFirst 5 centers:")
-            for center in centers[:5]:
-                print(f"  - {center['name']} at ({center['latitude']:.4f}, {center['longitude']:.4f})")
+            sys.stdout.flush()
+            np.savetxt(sys.stdout, table[:5], fmt='  - %s at (%.4f, %.4f)')
             
             # Check geographic distribution
-            lats = [c['latitude'] for c in centers]
-            lngs = [c['longitude'] for c in centers]
             print(f"\nGeographic coverage:")
-            print(f"  Latitude range: {min(lats):.4f} to {max(lats):.4f}")
-            print(f"  Longitude range: {min(lngs):.4f} to {max(lngs):.4f}")
+            print(f"  Latitude range: {table['latitude'].min():.4f} to {table['latitude'].max():.4f}")
+            print(f"  Longitude range: {table['longitude'].min():.4f} to {table['longitude'].max():.4f}")
         else:
             print("No centers returned!")
     else:
         print(f"Error: {response.text}")
 except Exception as e:
     print(f"Error: {e}")
+
+# Summarize the status of every probed endpoint
+print(f"\nEndpoint status:")
+for path, result in results.items():
+    if isinstance(result, Exception):
+        print(f"  {path}: error ({result})")
+    else:
+        print(f"  {path}: {result.status_code}")
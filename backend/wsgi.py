@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers
+Loads models and data at import so a preloading server does it once before forking
+
+Usage (from backend/): gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+from sheltr_backend import app, initialize_ml_models
+
+if not initialize_ml_models():
+    raise RuntimeError("Failed to initialize ML models")